@@ -1,118 +1,552 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+import uuid
+from functools import partial
 
 # Import from config
-from config import CUSTOM_CSS, MODERN_COLORS
+from config import (
+    ARTIFACT_DIR,
+    CUSTOM_CSS,
+    FEATURE_DTYPE,
+    FLOAT32_TOLERANCE,
+    IMPUTE_STRATEGIES,
+    IMPUTE_STRATEGY,
+    KNN_DEFAULT_K,
+    KNN_MAX_K,
+    LOD_MAX_POINTS_PER_CLASS,
+    MAX_PCA_COMPONENTS,
+    MODERN_COLORS,
+    PCA_COMPONENTS,
+    PCA_SOLVER,
+    PCA_SOLVERS,
+    PRECISIONS,
+    PROGRESSIVE_MIN_ROWS,
+    RANDOMIZED_OVERSAMPLES,
+    RANDOMIZED_POWER_ITERATIONS,
+    REGION_GRID_SIZE,
+    REGION_GRID_SIZE_2D,
+    SIDEBAR_MAX_SLIDERS,
+    SLIDER_PAGE_SIZE,
+)
 
 # Import from utils
-from utils.loader import load_and_preprocess_data
-from utils.pca_utils import apply_pca_and_scaling
+from utils.artifacts import fit_settings, load_artifact, save_artifact
+from utils.cache import digest_array, fit_cache, start_leasing
+from utils.loader import (
+    class_counts,
+    dataset_cache,
+    file_format,
+    load_dataset,
+    read_columns,
+    upload_digest,
+)
+from utils.jobs import JobFailed
+from utils.neighbors import neighbor_class_counts, neighbor_index, query_neighbors
+from utils.pca_utils import apply_pca_and_scaling, project_points, projection_axes
+from utils.progressive import preview_fit
+from utils.regions import class_regions, region_at, region_codes
+from utils.scenarios import fill_scenarios, read_scenarios, sweep_points
+from utils.perf import record_cache, start_recording, timed
+from utils.streaming import stream_pca_from_csv
 from utils.plot_utils import (
-    create_pca_3d_plot,
+    create_pca_3d_base_figure,
+    update_interactive_point,
     create_feature_loadings_heatmap,
     create_pca_variance_chart,
 )
 
 # Import from components
-from components.layout import render_header, render_metrics, render_sidebar_sliders
+from components.layout import (
+    render_header,
+    render_metrics,
+    render_performance_panel,
+    render_refinement_status,
+    render_sidebar_sliders,
+    render_what_if_inputs,
+    forget_job,
+    run_job,
+    start_job,
+)
 from components.instructions import render_landing_page
 
 st.set_page_config(page_title="PCA Classification Visualizer", layout="wide")
 
+# Stage timings and cache hits for this rerun
+perf = start_recording()
+
+# Shared datasets and fits used by this rerun stay pinned in the process-wide
+# caches until the next rerun or until the session ends. The previous rerun's
+# leases are kept one rerun longer, so they are not released before this
+# rerun has leased the same entries again.
+st.session_state["cache_leases"] = start_leasing(st.session_state.get("cache_leases"))
+
+# Background jobs are tracked per session and stage, so a newer request from
+# this session supersedes the job it replaces
+st.session_state.setdefault("session_key", uuid.uuid4().hex)
+
 # Apply custom CSS
 st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
 
 render_header()
 
 uploaded_file = st.file_uploader(
-    "📁 Choose a CSV file",
-    type="csv",
-    help="Upload a CSV file with numerical features and one target column",
+    "📁 Choose a CSV, Parquet or Feather file",
+    type=["csv", "parquet", "pq", "feather", "arrow"],
+    help="Upload a file with numerical features and one target column",
 )
 
-if uploaded_file is not None:
-    df = load_and_preprocess_data(uploaded_file)
+show_performance = st.sidebar.toggle(
+    "⏱ Performance panel",
+    help="Show stage timings, memory deltas and cache hits for each rerun",
+)
 
-    if df is None:
-        st.stop()
+streaming = st.sidebar.toggle(
+    "🌊 Streaming mode",
+    help="Read the CSV in chunks and fit with IncrementalPCA. "
+    "Use for datasets that do not fit in memory.",
+)
 
-    render_metrics(df)
+progressive = st.sidebar.toggle(
+    "⚡ Progressive preview",
+    value=True,
+    help=f"Above {PROGRESSIVE_MIN_ROWS:,} rows, show a fit on a row sample first "
+    "and switch to the full fit once it finishes in the background",
+)
 
-    # Show data preview
-    with st.expander("🔍 View Data Preview", expanded=False):
-        st.dataframe(df.head(10), use_container_width=True)
-        st.write("**Data Types:**")
-        st.write(df.dtypes)
+with st.sidebar.expander("⚙️ PCA Solver", expanded=False):
+    requested_components = st.number_input(
+        "Components (k)",
+        2,
+        MAX_PCA_COMPONENTS,
+        PCA_COMPONENTS,
+        help="Fitted once; any three of them can be put on the 3D plot axes "
+        "without refitting",
+    )
+    solver = st.selectbox(
+        "SVD solver",
+        PCA_SOLVERS,
+        index=PCA_SOLVERS.index(PCA_SOLVER),
+        help="'auto' picks covariance_eigh for tall data, randomized for "
+        "large matrices and full otherwise",
+    )
+    n_oversamples = st.number_input(
+        "Randomized oversamples", 1, 100, RANDOMIZED_OVERSAMPLES
+    )
+    power_iterations = st.number_input(
+        "Randomized power iterations", 0, 20, RANDOMIZED_POWER_ITERATIONS
+    )
+    precision = st.selectbox(
+        "Precision",
+        PRECISIONS,
+        index=PRECISIONS.index(FEATURE_DTYPE),
+        help="float32 halves memory and bandwidth from loading to plotting; "
+        "the fit is checked against float64 on a sample",
+    )
 
-    feature_columns = df.columns[:-1].tolist()
-    target_column = df.columns[-1]
+with st.sidebar.expander("🔭 Level of Detail", expanded=False):
+    lod_enabled = st.toggle(
+        "Downsample 3D plot",
+        value=True,
+        help="Send at most this many points per class to the browser, sampled "
+        "on a voxel grid so sparse regions and outliers are kept",
+    )
+    lod_max_points = st.number_input(
+        "Max points per class", 100, 1_000_000, LOD_MAX_POINTS_PER_CLASS, step=500
+    )
 
-    X = df[feature_columns].values
-    y = df[target_column].values
+with st.sidebar.expander("🧭 Nearest Neighbours", expanded=False):
+    knn_enabled = st.toggle(
+        "Find nearest neighbours",
+        value=True,
+        help="Look up the samples closest to the interactive point in PCA space "
+        "and classify it by their votes",
+    )
+    knn_k = st.slider("Neighbours (k)", 1, KNN_MAX_K, KNN_DEFAULT_K)
 
-    # Convert target to string for better handling
-    y_str = y.astype(str)
-    unique_classes = np.unique(y_str)
-    n_classes = len(unique_classes)
+with st.sidebar.expander("🗺️ Decision Regions", expanded=False):
+    regions_enabled = st.toggle(
+        "Show class regions",
+        help="Fit a classifier on the PCA coordinates once per projection and "
+        "shade where each class wins",
+    )
+    region_grid_size = st.slider(
+        "Grid resolution",
+        8,
+        40,
+        REGION_GRID_SIZE,
+        help="Grid points per axis; the 3D cost grows with its cube",
+    )
+
+artifact_panel = st.sidebar.expander("📦 Saved Projections", expanded=False)
+with artifact_panel:
+    use_artifacts = st.toggle(
+        "Reuse saved projections",
+        value=True,
+        help=f"Open a projection saved under '{ARTIFACT_DIR}/' for this exact file "
+        "instead of loading and fitting it again",
+    )
 
-    try:
-        X = X.astype(float)
-    except:
-        st.error("All feature columns must contain numerical values only.")
+if uploaded_file is not None:
+    # Column projection: only the selected features and the target are read
+    all_columns = read_columns(uploaded_file)
+    with st.sidebar.expander("🧩 Columns", expanded=False):
+        target_column = st.selectbox(
+            "Target column", all_columns, index=len(all_columns) - 1
+        )
+        candidate_columns = [c for c in all_columns if c != target_column]
+        selected_features = st.multiselect(
+            "Feature columns", candidate_columns, default=candidate_columns
+        )
+        impute_strategy = st.selectbox(
+            "Missing values",
+            IMPUTE_STRATEGIES,
+            index=IMPUTE_STRATEGIES.index(IMPUTE_STRATEGY),
+            help="Fill with the column mean or an approximate median, or drop "
+            "rows that have any. Streaming mode always fills with the mean.",
+        )
+    if not selected_features:
+        st.error("Select at least one feature column.")
         st.stop()
+    selected_columns = selected_features + [target_column]
 
-    # Get the pipeline and X_pca from apply_pca_and_scaling
-    X_pca, pipeline, _ = apply_pca_and_scaling(
-        X, feature_columns
-    )  # Corrected to receive pipeline object
+    if streaming and file_format(uploaded_file) != "csv":
+        st.info("🌊 Streaming mode reads CSV files; loading this file directly.")
+        streaming = False
+
+    dataset_digest = upload_digest(uploaded_file)
+    if selected_columns != all_columns:
+        dataset_digest += "-" + digest_array(
+            np.array([str(column) for column in selected_columns])
+        )
+    if impute_strategy != IMPUTE_STRATEGY and not streaming:
+        dataset_digest += f"-{impute_strategy}"
+    artifact_settings = fit_settings(
+        solver,
+        requested_components,
+        precision,
+        n_oversamples,
+        power_iterations,
+        streaming=streaming,
+    )
+    artifact = None
+    if use_artifacts:
+        artifact = load_artifact(ARTIFACT_DIR, dataset_digest, artifact_settings)
+        record_cache("artifact", artifact is not None)
+
+    X = None
+    preview_df = None
+    refinement = None
+    refinement_error = None
+    # Dataset rows behind a preview's sample positions
+    sample_rows = None
+
+    if artifact is not None:
+        # Memory-mapped arrays: no parsing and no fit
+        (
+            X_pca,
+            pipeline,
+            fit_info,
+            class_codes,
+            unique_classes,
+            feature_columns,
+        ) = artifact
+        st.info("📦 Opened the saved projection for this dataset.")
+        projection_key = ("artifact", dataset_digest)
+    elif streaming:
+        projection_key = (
+            "stream",
+            dataset_digest,
+            uploaded_file.size,
+            precision,
+            requested_components,
+        )
+        try:
+            with timed("stream_fit"):
+                (
+                    X_pca,
+                    pipeline,
+                    fit_info,
+                    class_codes,
+                    unique_classes,
+                    feature_columns,
+                    preview_df,
+                ) = run_job(
+                    "fit",
+                    projection_key,
+                    partial(
+                        stream_pca_from_csv,
+                        uploaded_file,
+                        cache_key=(dataset_digest, uploaded_file.size),
+                        columns=selected_columns,
+                        dtype=precision,
+                        n_components=requested_components,
+                    ),
+                    "Streaming the CSV through IncrementalPCA",
+                )
+            # The job's result comes back through a future; lease its cache
+            # entry for this session from the script thread
+            fit_cache.get(fit_info["cache_key"])
+        except Exception as e:
+            st.error(f"Error reading CSV file: {e}")
+            st.stop()
+    else:
+        try:
+            with timed("load"):
+                dataset = run_job(
+                    "load",
+                    ("load", dataset_digest, uploaded_file.size, precision),
+                    partial(
+                        load_dataset,
+                        uploaded_file,
+                        selected_columns,
+                        precision,
+                        impute_strategy,
+                    ),
+                    "Parsing the upload",
+                )
+        except JobFailed as e:
+            st.error(str(e))
+            st.stop()
+        # The parsed dataset comes from the job and is never parsed again here.
+        # Lease the shared copy for this session; a dataset over the cache
+        # budget was not cached and stays with the session's job outcome.
+        dataset_cache.lease(dataset["cache_key"])
+        for message in dataset["messages"]:
+            st.warning(message)
+
+        # Built once when the upload was parsed: reruns reuse the cached float
+        # matrix instead of selecting and casting the feature columns again
+        preview_df = dataset["preview"]
+        feature_columns = dataset["feature_columns"]
+        X = dataset["X"]
+        # Encoded once per dataset by the load job
+        class_codes = dataset["class_codes"]
+        unique_classes = dataset["unique_classes"]
+
+        fit_kwargs = dict(
+            solver=solver,
+            n_oversamples=n_oversamples,
+            power_iterations=power_iterations,
+            n_components=requested_components,
+        )
+        projection_key = (
+            "fit",
+            dataset_digest,
+            uploaded_file.size,
+            precision,
+            tuple(sorted(fit_kwargs.items())),
+        )
+        fit = partial(apply_pca_and_scaling, X, feature_columns, **fit_kwargs)
+        if progressive and len(X) > PROGRESSIVE_MIN_ROWS:
+            # The full fit runs once in the background for every session on
+            # this dataset; until it lands the page is built from a sample
+            try:
+                refinement, full_fit = start_job("fit", ("refine", projection_key), fit)
+            except JobFailed as e:
+                # Shown with the preview; not retried until the inputs change
+                full_fit, refinement_error = None, e
+            if full_fit is not None:
+                X_pca, pipeline, fit_info = full_fit
+                fit_cache.get(fit_info["cache_key"])
+                forget_job("preview")
+            else:
+                projection_key = ("preview", projection_key)
+                # Sampled, fitted and checked once per projection; the
+                # session keeps the outcome, so reruns during the refinement
+                # neither gather nor hash the sample again
+                try:
+                    with timed("preview_fit"):
+                        rows, (X_pca, pipeline, fit_info) = run_job(
+                            "preview",
+                            projection_key,
+                            partial(preview_fit, X, feature_columns, **fit_kwargs),
+                            "Fitting a preview on a row sample",
+                        )
+                except JobFailed as e:
+                    st.error(f"Error fitting the preview: {e}")
+                    st.stop()
+                fit_cache.get(fit_info["cache_key"])
+                # X stays whole for the sidebar's dataset rows; the plot and
+                # neighbours index the sample and map back through sample_rows
+                dataset_class_codes = class_codes
+                class_codes, sample_rows = class_codes[rows], rows
+        else:
+            # Get the pipeline and X_pca from apply_pca_and_scaling
+            try:
+                with timed("fit"):
+                    X_pca, pipeline, fit_info = run_job(
+                        "fit", projection_key, fit, "Fitting the scaler and PCA"
+                    )
+            except JobFailed as e:
+                st.error(f"Error fitting the scaler and PCA: {e}")
+                st.stop()
+            fit_cache.get(fit_info["cache_key"])
+
+    if sample_rows is None:
+        dataset_class_codes = class_codes
+    n_classes = len(unique_classes)
+
+    render_metrics(
+        fit_info["preview"]["total_rows"] if "preview" in fit_info else len(class_codes),
+        len(feature_columns),
+        n_classes,
+    )
+    if refinement is not None:
+        render_refinement_status(refinement, fit_info["preview"])
+    elif refinement_error is not None:
+        st.error(f"The full fit failed; showing the preview. {refinement_error}")
+
+    # Show data preview
+    if preview_df is not None:
+        with st.expander("🔍 View Data Preview", expanded=False):
+            st.dataframe(preview_df, use_container_width=True)
+            st.write("**Data Types:**")
+            st.write(preview_df.dtypes)
+
+    if artifact is None and "preview" not in fit_info:
+        with artifact_panel:
+            if st.button("💾 Save projection"):
+                save_artifact(
+                    ARTIFACT_DIR,
+                    dataset_digest,
+                    X_pca,
+                    pipeline,
+                    fit_info,
+                    class_codes,
+                    unique_classes,
+                    feature_columns,
+                    artifact_settings,
+                )
+                st.success(f"Saved to {ARTIFACT_DIR}/{dataset_digest}")
+
+    # min/max/mean/std computed once per fit, shared by the sidebar and the
+    # point summary
+    feature_stats = fit_info["feature_stats"]
 
     # Access the pca and scaler objects from the pipeline
     pca_model = pipeline.named_steps["pca"]
-    scaler_model = pipeline.named_steps["scaler"]
 
-    # Create PCA DataFrame
-    n_components = min(3, len(feature_columns))
+    n_components = pca_model.n_components_
     pca_columns = [f"PC{i+1}" for i in range(n_components)]
-    pca_df = pd.DataFrame(X_pca, columns=pca_columns)
-    pca_df["Class"] = y_str
+
+    # Any fitted components can drive the 3D axes; switching them slices the
+    # cached projection instead of refitting
+    with st.sidebar.expander("📐 Plot Axes", expanded=False):
+        axis_labels = [
+            st.selectbox(f"{axis} axis", pca_columns, index=i)
+            for i, axis in enumerate(["X", "Y", "Z"][: min(3, n_components)])
+        ]
+    plot_axes = [pca_columns.index(label) for label in axis_labels]
+    n_plot_components = len(plot_axes)
+    X_plot = projection_axes(X_pca, plot_axes)
 
     # PCA Information
     st.subheader("🔬 PCA Analysis")
     explained_variance = pca_model.explained_variance_ratio_  # Use pca_model here
     cumulative_variance = np.cumsum(explained_variance)
+    plot_variance = explained_variance[plot_axes]
 
     col1, col2 = st.columns(2)
 
     with col1:
         # No need for st.session_state here, as the chart is created on each run
         fig_var = create_pca_variance_chart(
-            pca_columns, explained_variance, cumulative_variance
+            pca_columns, explained_variance, cumulative_variance, axis_labels
         )
         st.plotly_chart(fig_var, use_container_width=True)
 
     with col2:
         st.write("**📋 PCA Summary:**")
-        for i, (pc, var) in enumerate(zip(pca_columns, explained_variance)):
+        for i, (pc, var) in enumerate(zip(pca_columns[:10], explained_variance)):
             st.write(f"• **{pc}**: {var:.1%} variance")
-        st.write(f"• **Total Explained**: {sum(explained_variance):.1%}")
-
-        if sum(explained_variance) < 0.8:
+        if n_components > 10:
+            st.write(f"• … {n_components - 10} more components")
+        st.write(
+            f"• **Total Explained** ({n_components} components): "
+            f"{sum(explained_variance):.1%}"
+        )
+        st.caption(
+            f"Solver: {fit_info['solver']} · fit in {fit_info['fit_seconds']:.2f}s"
+            + (" (cached)" if fit_info["cached"] else "")
+        )
+        float32_check = fit_info.get("float32_check")
+        if float32_check is not None:
+            message = (
+                f"float32 vs float64: variance Δ {float32_check['variance_error']:.1e}, "
+                f"loadings Δ {float32_check['loading_error']:.1e}"
+            )
+            if float32_check["within_tolerance"]:
+                st.caption(f"✅ {message}")
+            else:
+                st.warning(
+                    f"⚠️ {message} exceed the tolerance of {FLOAT32_TOLERANCE:g}. "
+                    "Consider float64 for this dataset."
+                )
+
+        if sum(plot_variance) < 0.8:
             st.warning(
-                "⚠️ First 3 components explain less than 80% of variance. Consider the limitations of 3D visualization."
+                "⚠️ The plotted components explain less than 80% of variance. Consider the limitations of 3D visualization."
             )
 
     # Sidebar for tunable data point
-    tunable_features = render_sidebar_sliders(df, feature_columns)
+    tunable_features = render_sidebar_sliders(feature_stats, feature_columns, X)
 
     # Transform the tunable point
     tunable_point = np.array(
         [tunable_features[feature] for feature in feature_columns]
     ).reshape(1, -1)
-    tunable_point_scaled = scaler_model.transform(
-        tunable_point
-    )  # Use scaler_model here
-    tunable_point_pca = pca_model.transform(tunable_point_scaled)  # Use pca_model here
+    with timed("transform_point"):
+        tunable_point_pca = project_points(pipeline, tunable_point)
+    tunable_point_plot = tunable_point_pca[:, plot_axes]
+
+    # What-if scenarios: every point goes through the scaler and PCA in one
+    # vectorized pass instead of one rerun per point
+    what_if = render_what_if_inputs(feature_columns)
+    what_if_pca = None
+    if what_if is not None:
+        if what_if["mode"] == "sweep":
+            sweep_feature = what_if["feature"]
+            sweep_index = feature_columns.index(sweep_feature)
+            what_if_points = sweep_points(
+                tunable_point[0],
+                sweep_index,
+                feature_stats.loc["min", sweep_feature],
+                feature_stats.loc["max", sweep_feature],
+                what_if["steps"],
+            )
+        else:
+            # Parsed once per upload and feature set; slider reruns only
+            # refill the empty cells and project again
+            scenario_key = (what_if["file"].file_id, tuple(feature_columns))
+            scenarios = st.session_state.get("what_if_scenarios")
+            if scenarios is None or scenarios["key"] != scenario_key:
+                try:
+                    with timed("what_if_read"):
+                        points, missing_columns = read_scenarios(
+                            what_if["file"], feature_columns
+                        )
+                except Exception as e:
+                    st.sidebar.error(f"Error reading scenarios: {e}")
+                    scenarios = None
+                else:
+                    scenarios = {
+                        "key": scenario_key,
+                        "points": points,
+                        "missing_columns": missing_columns,
+                    }
+                    st.session_state["what_if_scenarios"] = scenarios
+            what_if_points = None
+            if scenarios is not None:
+                what_if_points = fill_scenarios(scenarios["points"], tunable_point[0])
+                if scenarios["missing_columns"]:
+                    st.sidebar.caption(
+                        f"{len(scenarios['missing_columns'])} features are not in "
+                        "the file and use the interactive point's values."
+                    )
+        if what_if_points is not None:
+            with timed("what_if_project"):
+                what_if_pca = project_points(pipeline, what_if_points)
 
     # Determine colors based on number of classes
     if n_classes <= len(MODERN_COLORS):
@@ -124,15 +558,89 @@ if uploaded_file is not None:
 
     # color_map = {class_val: colors[i] for i, class_val in enumerate(unique_classes)} # This variable is not used
 
-    fig = create_pca_3d_plot(
-        pca_df,
-        tunable_point_pca,
-        n_components,
-        unique_classes,
-        colors,
-        explained_variance,
+    # kNN in PCA space against a KD-tree built once per projection
+    neighbor_indices = None
+    if knn_enabled:
+        # A failed index build only hides the overlay
+        try:
+            index = run_job(
+                "knn",
+                ("knn", projection_key, tuple(plot_axes)),
+                partial(neighbor_index, X_plot),
+                "Building the neighbour index",
+                stop=False,
+            )
+        except JobFailed as e:
+            st.warning(f"⚠️ Nearest neighbours are unavailable: {e}")
+            index = None
+        if index is not None:
+            with timed("knn_query"):
+                neighbor_distances, neighbor_indices = query_neighbors(
+                    index, tunable_point_plot, knn_k
+                )
+
+    # Class regions are evaluated on a grid once per projection; reruns only
+    # look up the cell under the point
+    regions = None
+    if regions_enabled:
+        grid_size = region_grid_size if n_plot_components > 2 else REGION_GRID_SIZE_2D
+        try:
+            with timed("region_mesh"):
+                regions = run_job(
+                    "regions",
+                    ("regions", projection_key, tuple(plot_axes), grid_size),
+                    partial(class_regions, X_plot, class_codes, n_classes, grid_size),
+                    "Evaluating class regions",
+                    stop=False,
+                )
+        except JobFailed as e:
+            st.warning(f"⚠️ Class regions are unavailable: {e}")
+
+    # The class traces only change with the fit or the plot settings, so the
+    # base figure is kept per session and slider reruns only move the point.
+    # The projection key names the dataset and its target: byte-identical
+    # features with other labels share X_plot but not the class partition.
+    base_settings = (
+        lod_max_points if lod_enabled else None,
+        projection_key,
+        tuple(colors),
+        region_grid_size if regions is not None else None,
+    )
+    base = st.session_state.get("pca_base_figure")
+    base_stale = (
+        base is None or base["X_pca"] is not X_plot or base["settings"] != base_settings
     )
-    st.plotly_chart(fig, use_container_width=True)
+    record_cache("base_figure", not base_stale)
+    if base_stale:
+        with timed("build_base_figure"):
+            base = {
+                "X_pca": X_plot,
+                "settings": base_settings,
+                "figure": create_pca_3d_base_figure(
+                    X_plot,
+                    class_codes,
+                    n_plot_components,
+                    unique_classes,
+                    colors,
+                    plot_variance,
+                    len(feature_columns),
+                    max_points_per_class=base_settings[0],
+                    regions=regions,
+                    axis_labels=axis_labels,
+                ),
+            }
+        st.session_state["pca_base_figure"] = base
+
+    with timed("update_point"):
+        fig = update_interactive_point(
+            base["figure"],
+            tunable_point_plot,
+            n_plot_components,
+            None if neighbor_indices is None else X_plot[neighbor_indices],
+            None if what_if_pca is None else what_if_pca[:, plot_axes],
+        )
+    with timed("serialize_3d"):
+        st.plotly_chart(fig, use_container_width=True, key="pca_3d_plot")
 
     # Current point information
     st.subheader("🎯 Current Interactive Point")
@@ -140,8 +648,22 @@ if uploaded_file is not None:
 
     with col1:
         st.markdown("**🔧 Original Feature Values:**")
-        feature_stats = df[feature_columns].describe()
-        for feature, value in tunable_features.items():
+        shown_features = tunable_features
+        if len(feature_columns) > SIDEBAR_MAX_SLIDERS:
+            # List only the features furthest from their mean, in std units
+            stds = feature_stats.loc["std"].to_numpy()
+            deviation = np.abs(
+                tunable_point[0] - feature_stats.loc["mean"].to_numpy()
+            ) / np.where(stds > 0, stds, 1.0)
+            top = np.argsort(deviation)[::-1][:SLIDER_PAGE_SIZE]
+            shown_features = {
+                feature_columns[i]: tunable_point[0, i] for i in top if deviation[i] > 0
+            }
+            st.caption(
+                f"Showing up to {SLIDER_PAGE_SIZE} features furthest from their "
+                "mean; all others are at their mean unless set in the sidebar."
+            )
+        for feature, value in shown_features.items():
             mean_val = feature_stats.loc["mean", feature]
             diff = value - mean_val
             direction = "↑" if diff > 0 else "↓" if diff < 0 else "="
@@ -149,8 +671,76 @@ if uploaded_file is not None:
 
     with col2:
         st.markdown("**📍 PCA Coordinates:**")
-        for i, coord in enumerate(tunable_point_pca[0]):
-            st.write(f"• **PC{i+1}**: {coord:.3f}")
+        for label, coord in zip(axis_labels, tunable_point_plot[0]):
+            st.write(f"• **{label}**: {coord:.3f}")
+        if n_components > n_plot_components:
+            st.caption(
+                "All components: "
+                + ", ".join(
+                    f"{pc} {coord:.2f}"
+                    for pc, coord in zip(pca_columns, tunable_point_pca[0])
+                )
+            )
+        if regions is not None:
+            region_class = unique_classes[region_at(regions, tunable_point_plot)]
+            st.write(f"• **Decision region**: {region_class}")
+
+    if neighbor_indices is not None:
+        neighbor_counts = neighbor_class_counts(
+            class_codes, neighbor_indices, n_classes
+        )
+        st.markdown(f"**🧭 {len(neighbor_indices)} Nearest Neighbours:**")
+        col1, col2 = st.columns(2)
+
+        with col1:
+            winner = np.argmax(neighbor_counts)
+            st.write(
+                f"• **kNN class**: {unique_classes[winner]} "
+                f"({neighbor_counts[winner] / len(neighbor_indices):.0%} of neighbours)"
+            )
+            vote_share = pd.Series(neighbor_counts, index=unique_classes)
+            st.dataframe(
+                vote_share[vote_share > 0]
+                .sort_values(ascending=False)
+                .to_frame("Neighbours")
+            )
+
+        with col2:
+            st.dataframe(
+                pd.DataFrame(
+                    {
+                        "Row": (
+                            neighbor_indices
+                            if sample_rows is None
+                            else sample_rows[neighbor_indices]
+                        ),
+                        "Class": unique_classes[class_codes[neighbor_indices]],
+                        "Distance": neighbor_distances.round(4),
+                    }
+                ),
+                hide_index=True,
+            )
+
+    if what_if_pca is not None:
+        st.markdown(f"**🧪 What-if Scenarios ({len(what_if_pca):,}):**")
+        what_if_df = pd.DataFrame(what_if_pca, columns=pca_columns)
+        if what_if["mode"] == "sweep":
+            what_if_df.insert(0, sweep_feature, what_if_points[:, sweep_index])
+        if regions is not None:
+            what_if_df["Decision region"] = unique_classes[
+                region_codes(regions, what_if_pca[:, plot_axes])
+            ]
+        st.dataframe(what_if_df.head(1000).round(4), hide_index=True)
+        # Serializing every scenario is O(n), so the CSV is only built on
+        # request rather than on every slider rerun
+        if st.button("📄 Prepare CSV of projected scenarios"):
+            st.download_button(
+                "⬇️ Download projected scenarios",
+                what_if_df.to_csv(index=False),
+                file_name="what_if_projections.csv",
+                mime="text/csv",
+                on_click="ignore",
+            )
 
     # Feature importance analysis
     st.subheader("🔍 Feature Analysis")
@@ -161,15 +751,17 @@ if uploaded_file is not None:
         index=feature_columns,
     )
 
-    fig_heatmap = create_feature_loadings_heatmap(loadings_df)
-    st.plotly_chart(fig_heatmap, use_container_width=True)
+    with timed("build_heatmap"):
+        fig_heatmap = create_feature_loadings_heatmap(loadings_df)
+    with timed("serialize_heatmap"):
+        st.plotly_chart(fig_heatmap, use_container_width=True)
 
     # Top contributing features
     col1, col2 = st.columns(2)
 
     with col1:
-        st.markdown("**🏆 Top Features for Each Component:**")
-        for i, pc in enumerate(pca_columns):
+        st.markdown("**🏆 Top Features for Each Plotted Component:**")
+        for pc in axis_labels:
             abs_loadings = np.abs(loadings_df[pc])
             top_features = abs_loadings.nlargest(3)
             st.write(f"**{pc}:**")
@@ -179,7 +771,7 @@ if uploaded_file is not None:
     with col2:
         # Feature importance summary
         feature_importance = (
-            np.abs(loadings_df).sum(axis=1).sort_values(ascending=False)
+            np.abs(loadings_df[axis_labels]).sum(axis=1).sort_values(ascending=False)
         )
         st.markdown("**📊 Overall Feature Importance:**")
         for feature, importance in feature_importance.head(5).items():
@@ -192,11 +784,30 @@ if uploaded_file is not None:
         with col1:
             st.write("**Feature Loadings Table:**")
             st.dataframe(loadings_df.round(4))
+            st.write("**Top Features by Component:**")
+            st.dataframe(
+                pd.DataFrame.from_dict(
+                    {
+                        pc: np.abs(loadings_df[pc]).nlargest(3).index.tolist()
+                        for pc in pca_columns
+                    },
+                    orient="index",
+                )
+            )
 
         with col2:
+            # Counted over every dataset row, also while a preview is shown
             st.write("**Class Distribution:**")
-            class_counts = pd.Series(y_str).value_counts()
-            st.dataframe(class_counts.to_frame("Count"))
+            class_distribution = pd.Series(
+                class_counts(dataset_class_codes, n_classes), index=unique_classes
+            ).sort_values(ascending=False)
+            st.dataframe(class_distribution.to_frame("Count"))
 
 else:
     render_landing_page()
+
+perf.log()
+if show_performance:
+    render_performance_panel(
+        perf, {"dataset_cache": dataset_cache.stats(), "fit_cache": fit_cache.stats()}
+    )
@@ -0,0 +1,311 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from config import (
+    ARTIFACT_DIR,
+    FEATURE_DTYPE,
+    MAX_PCA_COMPONENTS,
+    PCA_COMPONENTS,
+    PCA_SOLVER,
+    PCA_SOLVERS,
+    RANDOMIZED_OVERSAMPLES,
+    RANDOMIZED_POWER_ITERATIONS,
+    STREAM_CHUNK_ROWS,
+)
+from utils.artifacts import fit_settings, save_artifact
+from utils.cache import digest_file
+from utils.loader import encode_classes, impute_missing
+from utils.pca_utils import affine_projection, apply_pca_and_scaling, project_affine
+from utils.streaming import stream_pca_from_csv
+
+
+def _is_parquet(path):
+    return path.lower().endswith((".parquet", ".pq"))
+
+
+def _read_frame(path):
+    if _is_parquet(path):
+        return pd.read_parquet(path)
+    return pd.read_csv(path, engine="pyarrow")
+
+
+def _iter_batches(path, columns, chunk_rows):
+    if _is_parquet(path):
+        parquet_file = pq.ParquetFile(path)
+        present = [c for c in columns if c in parquet_file.schema_arrow.names]
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=present):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(
+            path,
+            chunksize=chunk_rows,
+            usecols=lambda column: column in columns,
+        )
+
+
+def fit_model(
+    input_path,
+    model_path,
+    solver=PCA_SOLVER,
+    n_oversamples=RANDOMIZED_OVERSAMPLES,
+    power_iterations=RANDOMIZED_POWER_ITERATIONS,
+    streaming=False,
+    artifact_dir=None,
+    n_components=PCA_COMPONENTS,
+):
+    if streaming:
+        (
+            X_pca,
+            pipeline,
+            fit_info,
+            class_codes,
+            unique_classes,
+            feature_columns,
+            _,
+        ) = stream_pca_from_csv(input_path, n_components=n_components)
+        target_column = pd.read_csv(input_path, nrows=0).columns[-1]
+        n_rows = len(class_codes)
+    else:
+        df = _read_frame(input_path)
+        feature_columns = df.columns[:-1].tolist()
+        target_column = df.columns[-1]
+        df, _ = impute_missing(df, feature_columns)
+        X = df[feature_columns].to_numpy(dtype=FEATURE_DTYPE)
+        y = df[target_column].to_numpy()
+        X_pca, pipeline, fit_info = apply_pca_and_scaling(
+            X,
+            feature_columns,
+            solver=solver,
+            n_oversamples=n_oversamples,
+            power_iterations=power_iterations,
+            n_components=n_components,
+        )
+        n_rows = len(X)
+
+    joblib.dump(
+        {
+            "pipeline": pipeline,
+            "feature_columns": feature_columns,
+            "target_column": target_column,
+            "fit_info": fit_info,
+        },
+        model_path,
+    )
+
+    if artifact_dir is not None:
+        # Lets the app open this file's projection without loading or fitting it
+        if not streaming:
+            class_codes, unique_classes = encode_classes(y)
+        save_artifact(
+            artifact_dir,
+            digest_file(input_path),
+            X_pca,
+            pipeline,
+            fit_info,
+            class_codes,
+            unique_classes,
+            feature_columns,
+            fit_settings(
+                solver,
+                n_components,
+                FEATURE_DTYPE,
+                n_oversamples,
+                power_iterations,
+                streaming=streaming,
+            ),
+        )
+    return n_rows, fit_info
+
+
+def _output_path(input_path, output_dir):
+    return os.path.join(
+        output_dir, os.path.splitext(os.path.basename(input_path))[0] + ".parquet"
+    )
+
+
+def project_file(model_path, input_path, output_dir, chunk_rows=STREAM_CHUNK_ROWS):
+    model = joblib.load(model_path)
+    pipeline = model["pipeline"]
+    feature_columns = model["feature_columns"]
+    target_column = model["target_column"]
+    means = pipeline.named_steps["scaler"].mean_
+    n_components = pipeline.named_steps["pca"].n_components_
+    # One fused scaler+PCA map and one output buffer reused for every chunk
+    affine = affine_projection(pipeline)
+    buffer = np.empty((chunk_rows, n_components))
+
+    output_path = _output_path(input_path, output_dir)
+    schema = pa.schema(
+        [(f"PC{i+1}", pa.float64()) for i in range(n_components)]
+        + [("Class", pa.string())]
+    )
+
+    start = time.perf_counter()
+    n_rows = 0
+    try:
+        with pq.ParquetWriter(output_path, schema) as writer:
+            for chunk in _iter_batches(
+                input_path, feature_columns + [target_column], chunk_rows
+            ):
+                X = chunk[feature_columns].to_numpy(dtype=FEATURE_DTYPE)
+                missing = np.isnan(X)
+                if missing.any():
+                    X[missing] = np.take(means, np.nonzero(missing)[1])
+                X_pca = project_affine(X, affine, out=buffer[: len(X)])
+
+                columns = {f"PC{i+1}": X_pca[:, i] for i in range(n_components)}
+                columns["Class"] = (
+                    chunk[target_column].astype(str).to_numpy()
+                    if target_column in chunk
+                    else np.full(len(chunk), None)
+                )
+                writer.write_table(pa.table(columns, schema=schema))
+                n_rows += len(chunk)
+    except BaseException:
+        # A file that fails part way leaves no partial output behind
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+
+    return input_path, output_path, n_rows, time.perf_counter() - start
+
+
+def check_outputs(input_paths, output_dir):
+    # Workers writing the same output file at once would corrupt it, e.g. for
+    # a/day.csv and b/day.csv, or x.csv and x.parquet
+    inputs_by_output = {}
+    for path in input_paths:
+        inputs_by_output.setdefault(_output_path(path, output_dir), []).append(path)
+    collisions = [paths for paths in inputs_by_output.values() if len(paths) > 1]
+    if collisions:
+        raise ValueError(
+            "Inputs would write the same output file: "
+            + "; ".join(", ".join(paths) for paths in collisions)
+        )
+
+
+def project_files(
+    model_path, input_paths, output_dir, workers=None, chunk_rows=STREAM_CHUNK_ROWS
+):
+    # Returns (results, failures). Only colliding outputs raise, before any
+    # work starts; a file that fails is reported with its path in failures
+    # and does not stop the others.
+    check_outputs(input_paths, output_dir)
+
+    os.makedirs(output_dir, exist_ok=True)
+    results = []
+    failures = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(project_file, model_path, path, output_dir, chunk_rows): path
+            for path in input_paths
+        }
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                failures.append((futures[future], e))
+    return results, failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Fit and apply the PCA Classification Visualizer pipeline without Streamlit"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    fit_parser = subparsers.add_parser(
+        "fit", help="Fit the scaler+PCA pipeline and save it"
+    )
+    fit_parser.add_argument(
+        "input", help="CSV or Parquet file; the last column is the target"
+    )
+    fit_parser.add_argument("model", help="Output path for the joblib model")
+    fit_parser.add_argument("--solver", choices=PCA_SOLVERS, default=PCA_SOLVER)
+    fit_parser.add_argument(
+        "--components",
+        type=int,
+        default=PCA_COMPONENTS,
+        help=f"Number of principal components to fit (at most {MAX_PCA_COMPONENTS})",
+    )
+    fit_parser.add_argument("--oversamples", type=int, default=RANDOMIZED_OVERSAMPLES)
+    fit_parser.add_argument(
+        "--power-iterations", type=int, default=RANDOMIZED_POWER_ITERATIONS
+    )
+    fit_parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Fit a CSV in chunks with IncrementalPCA",
+    )
+
+    fit_parser.add_argument(
+        "--artifact-dir",
+        help="Also save a memory-mappable projection the app can open directly "
+        f"(the app reads '{ARTIFACT_DIR}')",
+    )
+
+    project_parser = subparsers.add_parser(
+        "project", help="Project CSV/Parquet files onto PC1..PCk with a saved model"
+    )
+    project_parser.add_argument("model", help="joblib model written by 'fit'")
+    project_parser.add_argument("output_dir", help="Directory for the Parquet outputs")
+    project_parser.add_argument("inputs", nargs="+", help="CSV or Parquet files")
+    project_parser.add_argument("--workers", type=int, default=None)
+    project_parser.add_argument("--chunk-rows", type=int, default=STREAM_CHUNK_ROWS)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "fit":
+        start = time.perf_counter()
+        n_rows, fit_info = fit_model(
+            args.input,
+            args.model,
+            solver=args.solver,
+            n_oversamples=args.oversamples,
+            power_iterations=args.power_iterations,
+            streaming=args.streaming,
+            artifact_dir=args.artifact_dir,
+            n_components=min(args.components, MAX_PCA_COMPONENTS),
+        )
+        elapsed = time.perf_counter() - start
+        print(
+            f"Fitted {n_rows:,} rows with solver={fit_info['solver']} in {elapsed:.2f}s "
+            f"({n_rows / elapsed:,.0f} rows/s) -> {args.model}"
+        )
+    else:
+        start = time.perf_counter()
+        try:
+            check_outputs(args.inputs, args.output_dir)
+        except ValueError as e:
+            parser.error(str(e))
+        results, failures = project_files(
+            args.model, args.inputs, args.output_dir, args.workers, args.chunk_rows
+        )
+        for input_path, output_path, n_rows, seconds in results:
+            print(
+                f"{input_path}: {n_rows:,} rows in {seconds:.2f}s "
+                f"({n_rows / max(seconds, 1e-9):,.0f} rows/s) -> {output_path}"
+            )
+        elapsed = time.perf_counter() - start
+        total_rows = sum(result[2] for result in results)
+        print(
+            f"Total: {total_rows:,} rows from {len(results)} files in {elapsed:.2f}s "
+            f"({total_rows / elapsed:,.0f} rows/s)"
+        )
+        for input_path, error in failures:
+            print(f"{input_path}: failed: {error}", file=sys.stderr)
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
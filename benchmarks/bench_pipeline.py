@@ -0,0 +1,229 @@
+import argparse
+import io
+import itertools
+import json
+import logging
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from config import MODERN_COLORS
+from utils.cache import fit_cache
+from utils.loader import dataset_cache, encode_classes, load_and_preprocess_data
+from utils.pca_utils import affine_projection, apply_pca_and_scaling, project_affine
+from utils.plot_utils import create_feature_loadings_heatmap, create_pca_3d_plot
+
+STAGES = ["load", "fit", "project", "render_3d", "render_heatmap"]
+
+
+class SyntheticUpload(io.BytesIO):
+    # Enough of Streamlit's UploadedFile for load_and_preprocess_data
+    def __init__(self, data, name="synthetic.csv"):
+        super().__init__(data)
+        self.name = name
+        self.file_id = f"bench-{id(self)}"
+
+    @property
+    def size(self):
+        return len(self.getbuffer())
+
+
+def make_dataset(n_rows, n_features, n_classes, seed=0, missing_rate=0.0):
+    # Gaussian class blobs around a low-rank structure, so PCA has real signal
+    rng = np.random.default_rng(seed)
+    rank = min(n_features, 5)
+    centers = rng.normal(scale=3.0, size=(n_classes, rank))
+    mixing = rng.normal(size=(rank, n_features))
+    labels = rng.integers(0, n_classes, size=n_rows)
+    latent = centers[labels] + rng.normal(size=(n_rows, rank))
+    X = latent @ mixing + rng.normal(scale=0.5, size=(n_rows, n_features))
+    if missing_rate:
+        X[rng.random(X.shape) < missing_rate] = np.nan
+
+    df = pd.DataFrame(X, columns=[f"feature_{i}" for i in range(n_features)])
+    df["target"] = [f"class_{label}" for label in labels]
+    return df
+
+
+def _max_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1024**2 if platform.system() == "Darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def _measure(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+
+    # A separate traced run: tracemalloc slows Python-heavy stages down, so it
+    # is kept out of the timings
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, {
+        "seconds": min(timings),
+        "peak_alloc_mb": peak / 1024**2,
+        "max_rss_mb": _max_rss_mb(),
+    }
+
+
+def run_case(n_rows, n_features, n_classes, repeat=3, max_points_per_class=5000):
+    df = make_dataset(n_rows, n_features, n_classes)
+    csv_bytes = df.to_csv(index=False).encode()
+    results = {}
+
+    def load():
+        dataset_cache.clear()
+        return load_and_preprocess_data(SyntheticUpload(csv_bytes))
+
+    loaded, results["load"] = _measure(load, repeat)
+    results["load"]["input_mb"] = len(csv_bytes) / 1024**2
+
+    feature_columns = loaded.columns[:-1].tolist()
+    X = loaded[feature_columns].to_numpy(dtype=float)
+
+    def fit():
+        fit_cache.clear()
+        return apply_pca_and_scaling(X, feature_columns)
+
+    (X_pca, pipeline, fit_info), results["fit"] = _measure(fit, repeat)
+    results["fit"]["solver"] = fit_info["solver"]
+
+    _, results["project"] = _measure(
+        lambda: project_affine(X, affine_projection(pipeline)), repeat
+    )
+
+    class_codes, unique_classes = encode_classes(loaded[loaded.columns[-1]].to_numpy())
+    pca_model = pipeline.named_steps["pca"]
+    n_components = pca_model.n_components_
+    n_plot_components = min(3, n_components)
+    colors = (MODERN_COLORS * (n_classes // len(MODERN_COLORS) + 1))[:n_classes]
+
+    def render_3d():
+        fig = create_pca_3d_plot(
+            X_pca[:, :n_plot_components],
+            class_codes,
+            X_pca[:1, :n_plot_components],
+            n_plot_components,
+            unique_classes,
+            colors,
+            pca_model.explained_variance_ratio_[:n_plot_components],
+            len(feature_columns),
+            max_points_per_class=max_points_per_class,
+        )
+        return fig.to_json()
+
+    payload, results["render_3d"] = _measure(render_3d, repeat)
+    results["render_3d"]["figure_mb"] = len(payload) / 1024**2
+
+    loadings_df = pd.DataFrame(
+        pca_model.components_.T,
+        columns=[f"PC{i+1}" for i in range(n_components)],
+        index=feature_columns,
+    )
+    payload, results["render_heatmap"] = _measure(
+        lambda: create_feature_loadings_heatmap(loadings_df).to_json(), repeat
+    )
+    results["render_heatmap"]["figure_mb"] = len(payload) / 1024**2
+
+    return results
+
+
+def compare(current, baseline, threshold):
+    baseline_cases = {case["case"]: case for case in baseline["cases"]}
+    regressions = []
+    for case in current["cases"]:
+        previous = baseline_cases.get(case["case"])
+        if previous is None:
+            continue
+        for stage in STAGES:
+            before = previous["stages"][stage]["seconds"]
+            after = case["stages"][stage]["seconds"]
+            ratio = after / before if before else float("inf")
+            flag = " ⚠️" if ratio > threshold else ""
+            print(
+                f"{case['case']:<28} {stage:<15} {before:8.3f}s -> {after:8.3f}s  x{ratio:.2f}{flag}"
+            )
+            if ratio > threshold:
+                regressions.append((case["case"], stage, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark load -> fit -> project -> render without Streamlit"
+    )
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--features", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--classes", type=int, nargs="+", default=[3, 50])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON from an earlier run")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="Slowdown ratio versus the baseline that counts as a regression",
+    )
+    args = parser.parse_args(argv)
+
+    # The loader reports through st.warning, which only logs outside Streamlit
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    results = {
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cases": [],
+    }
+    for n_rows, n_features, n_classes in itertools.product(
+        args.rows, args.features, args.classes
+    ):
+        name = f"{n_rows}x{n_features}/{n_classes}cls"
+        stages = run_case(n_rows, n_features, n_classes, repeat=args.repeat)
+        results["cases"].append(
+            {
+                "case": name,
+                "rows": n_rows,
+                "features": n_features,
+                "classes": n_classes,
+                "stages": stages,
+            }
+        )
+        for stage in STAGES:
+            metrics = stages[stage]
+            extra = (
+                f"  figure {metrics['figure_mb']:.2f} MB"
+                if "figure_mb" in metrics
+                else ""
+            )
+            print(
+                f"{name:<28} {stage:<15} {metrics['seconds']:8.3f}s  "
+                f"peak alloc {metrics['peak_alloc_mb']:8.1f} MB  "
+                f"max RSS {metrics['max_rss_mb']:8.1f} MB{extra}"
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
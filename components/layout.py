@@ -1,5 +1,21 @@
+import json
+import time
+from concurrent.futures import wait
+
+import numpy as np
+import pandas as pd
 import streamlit as st
 
+from config import (
+    JOB_POLL_SECONDS,
+    JOB_WAIT_SECONDS,
+    PROGRESSIVE_POLL_SECONDS,
+    SIDEBAR_MAX_SLIDERS,
+    SLIDER_PAGE_SIZE,
+    WHAT_IF_SWEEP_STEPS,
+)
+from utils.jobs import JobFailed, jobs
+
 
 def render_header():
     st.markdown(
@@ -15,31 +31,52 @@ def render_header():
     )
 
 
-def render_metrics(df):
+def render_metrics(n_samples, n_features, n_classes):
     st.subheader("📊 Data Overview")
     col1, col2, col3 = st.columns(3)
 
     with col1:
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("📈 Samples", f"{len(df):,}")
+        st.metric("📈 Samples", f"{n_samples:,}")
         st.markdown("</div>", unsafe_allow_html=True)
 
     with col2:
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("🔢 Features", f"{df.shape[1] - 1}")
+        st.metric("🔢 Features", f"{n_features}")
         st.markdown("</div>", unsafe_allow_html=True)
 
     with col3:
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("🎯 Classes", f"{df.iloc[:, -1].nunique()}")
+        st.metric("🎯 Classes", f"{n_classes}")
         st.markdown("</div>", unsafe_allow_html=True)
 
 
-def render_sidebar_sliders(df, feature_columns):
+def _feature_slider(feature, feature_stats, value=None):
+    min_val = float(feature_stats.loc["min", feature])
+    max_val = float(feature_stats.loc["max", feature])
+    mean_val = float(feature_stats.loc["mean", feature])
+    std_val = float(feature_stats.loc["std", feature])
+
+    slider_min = min_val - std_val
+    slider_max = max_val + std_val
+
+    return st.sidebar.slider(
+        f"🔹 {feature}",
+        min_value=slider_min,
+        max_value=slider_max,
+        value=mean_val if value is None else min(max(value, slider_min), slider_max),
+        step=(slider_max - slider_min) / 100,
+        help=f"Range: {min_val:.2f} to {max_val:.2f}, Mean: {mean_val:.2f}",
+    )
+
+
+def render_sidebar_sliders(feature_stats, feature_columns, X=None):
     st.sidebar.markdown("## 🎛️ Interactive Data Point")
     st.sidebar.markdown("Adjust feature values to explore the classification space")
 
-    feature_stats = df[feature_columns].describe()
+    if len(feature_columns) > SIDEBAR_MAX_SLIDERS:
+        return _render_scalable_inputs(feature_stats, feature_columns, X)
+
     tunable_features = {}
 
     if len(feature_columns) > 6:
@@ -56,42 +93,232 @@ def render_sidebar_sliders(df, feature_columns):
                 )
 
             for feature in feature_group:
-                min_val = float(feature_stats.loc["min", feature])
-                max_val = float(feature_stats.loc["max", feature])
-                mean_val = float(feature_stats.loc["mean", feature])
-                std_val = float(feature_stats.loc["std", feature])
-
-                slider_min = min_val - std_val
-                slider_max = max_val + std_val
-
-                tunable_features[feature] = st.sidebar.slider(
-                    f"🔹 {feature}",
-                    min_value=slider_min,
-                    max_value=slider_max,
-                    value=mean_val,
-                    step=(slider_max - slider_min) / 100,
-                    help=f"Range: {min_val:.2f} to {max_val:.2f}, Mean: {mean_val:.2f}",
-                )
+                tunable_features[feature] = _feature_slider(feature, feature_stats)
     else:
         for feature in feature_columns:
-            min_val = float(feature_stats.loc["min", feature])
-            max_val = float(feature_stats.loc["max", feature])
-            mean_val = float(feature_stats.loc["mean", feature])
-            std_val = float(feature_stats.loc["std", feature])
-
-            slider_min = min_val - std_val
-            slider_max = max_val + std_val
-
-            tunable_features[feature] = st.sidebar.slider(
-                f"🔹 {feature}",
-                min_value=slider_min,
-                max_value=slider_max,
-                value=mean_val,
-                step=(slider_max - slider_min) / 100,
-                help=f"Range: {min_val:.2f} to {max_val:.2f}, Mean: {mean_val:.2f}",
-            )
+            tunable_features[feature] = _feature_slider(feature, feature_stats)
 
     if st.sidebar.button("🔄 Reset to Mean Values"):
         st.rerun()
 
     return tunable_features
+
+
+def _render_scalable_inputs(feature_stats, feature_columns, X):
+    # High-dimensional data: only the active page of sliders is created.
+    # Every other feature takes its mean or a value kept in session state, so
+    # the widget count does not grow with the number of features.
+    # Overrides belong to one set of feature columns; another dataset or
+    # feature selection starts again from the means
+    columns_key = tuple(feature_columns)
+    if st.session_state.get("tunable_overrides_columns") != columns_key:
+        st.session_state["tunable_overrides_columns"] = columns_key
+        st.session_state["tunable_overrides"] = {}
+    overrides = st.session_state["tunable_overrides"]
+    values = feature_stats.loc["mean"].to_numpy(dtype=float, copy=True)
+
+    modes = ["Paged sliders", "Paste vector"]
+    if X is not None:
+        modes.append("Dataset row")
+    mode = st.sidebar.radio("Input mode", modes, horizontal=True)
+
+    if mode == "Paged sliders":
+        query = st.sidebar.text_input("🔎 Search features")
+        matches = [
+            feature
+            for feature in feature_columns
+            if query.lower() in str(feature).lower()
+        ]
+        n_pages = max(1, -(-len(matches) // SLIDER_PAGE_SIZE))
+        page = st.sidebar.number_input(
+            f"Page (of {n_pages})", min_value=1, max_value=n_pages, value=1
+        )
+
+        page_start = (page - 1) * SLIDER_PAGE_SIZE
+        page_features = matches[page_start : page_start + SLIDER_PAGE_SIZE]
+        st.sidebar.markdown(
+            f"### 📊 Features {page_start + 1}-{page_start + len(page_features)} of {len(matches)}"
+        )
+        for feature in page_features:
+            overrides[feature] = _feature_slider(
+                feature, feature_stats, overrides.get(feature)
+            )
+
+        if overrides:
+            positions = {feature: i for i, feature in enumerate(feature_columns)}
+            for feature, value in overrides.items():
+                if feature in positions:
+                    values[positions[feature]] = value
+
+    elif mode == "Paste vector":
+        text = st.sidebar.text_area(
+            f"Values for all {len(feature_columns)} features",
+            help="Comma or whitespace separated, in column order. "
+            "Leave empty to use the feature means.",
+        )
+        if text.strip():
+            try:
+                pasted = np.array(text.replace(",", " ").split(), dtype=float)
+            except ValueError:
+                pasted = None
+            if pasted is None or len(pasted) != len(feature_columns):
+                st.sidebar.error(
+                    f"Expected {len(feature_columns)} numeric values; using the means."
+                )
+            else:
+                values = pasted
+
+    else:
+        row = st.sidebar.number_input(
+            f"Row index (0-{len(X) - 1})", min_value=0, max_value=len(X) - 1, value=0
+        )
+        values = np.asarray(X[row], dtype=float)
+
+    if st.sidebar.button("🔄 Reset to Mean Values"):
+        overrides.clear()
+        st.rerun()
+
+    return dict(zip(feature_columns, values.tolist()))
+
+
+def render_performance_panel(recorder, cache_stats=None):
+    report = recorder.to_dict()
+    if cache_stats:
+        report["caches"] = cache_stats
+    with st.expander("⏱ Performance", expanded=True):
+        st.caption(
+            f"This rerun took {report['total_ms']:.0f} ms; "
+            f"process RSS is {report['rss_mb']:.0f} MB"
+        )
+        if report["stages"]:
+            stages = pd.DataFrame(report["stages"]).set_index("stage")
+            st.dataframe(stages.style.format("{:.1f}", na_rep="–"))
+        if report["counters"]:
+            st.dataframe(
+                pd.Series(report["counters"], name="count").sort_index().to_frame()
+            )
+        if cache_stats:
+            st.caption("Shared caches (all sessions in this server process):")
+            st.dataframe(pd.DataFrame(cache_stats).T.round(1))
+        st.download_button(
+            "⬇️ Export JSON",
+            json.dumps(report, indent=2),
+            file_name="pca_visualizer_perf.json",
+            mime="application/json",
+        )
+
+
+@st.fragment(run_every=PROGRESSIVE_POLL_SECONDS)
+def render_refinement_status(job, preview):
+    # Polls the background fit; once it lands, or fails, the whole page reruns
+    # once on its outcome
+    if job.future.done():
+        st.rerun()
+
+    elapsed = time.monotonic() - job.started
+    estimate = max(preview["estimated_seconds"], 1e-3)
+    remaining = (
+        f"~{estimate - elapsed:.0f}s left" if elapsed < estimate else "almost done"
+    )
+    st.progress(
+        min(elapsed / estimate, 0.99),
+        text=f"⚡ Preview from {preview['rows']:,} of {preview['total_rows']:,} rows "
+        f"(explained variance within ±{preview['variance_spread']:.1%}). "
+        f"Refining on all rows: {elapsed:.0f}s elapsed, {remaining}.",
+    )
+
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def _render_job_status(job, label):
+    if job.future.done():
+        st.rerun()
+    elapsed = time.monotonic() - job.started
+    st.info(f"⏳ {label} · job {job.id} {job.status()} for {elapsed:.0f}s")
+
+
+def _job_owner(stage):
+    return (st.session_state["session_key"], stage)
+
+
+def _job_outcomes():
+    # Per stage, such as "load" or "fit": the inputs of this session's last
+    # finished job with its result or error
+    return st.session_state.setdefault("job_outcomes", {})
+
+
+def _take_outcome(stage, job):
+    # Moves a finished job's outcome into the session and releases the job, so
+    # the manager drops its result once every owner has taken it. Only the
+    # error's message is kept, not the traceback and the frames it holds.
+    error = job.future.exception()
+    if error is None:
+        outcome = (job.key, job.future.result(), None)
+    else:
+        outcome = (job.key, None, str(error))
+    _job_outcomes()[stage] = outcome
+    jobs.release(job, _job_owner(stage))
+    return outcome
+
+
+def start_job(stage, key, fn, timeout=0):
+    # Returns (job, None) while the session's job for this stage runs and
+    # (None, result) once it is done. Reruns with the same inputs reuse the
+    # outcome the session took without submitting anything; a failure raises
+    # JobFailed until the inputs change rather than running the job again.
+    outcome = _job_outcomes().get(stage)
+    if outcome is None or outcome[0] != key:
+        job = jobs.submit(key, fn, owner=_job_owner(stage))
+        wait([job.future], timeout=timeout)
+        if not job.future.done():
+            return job, None
+        outcome = _take_outcome(stage, job)
+
+    _, result, error = outcome
+    if error is not None:
+        raise JobFailed(error)
+    return None, result
+
+
+def forget_job(stage):
+    # The page no longer needs this stage: supersede its job and drop the
+    # session's outcome
+    jobs.abandon(_job_owner(stage))
+    _job_outcomes().pop(stage, None)
+
+
+def run_job(stage, key, fn, label, stop=True):
+    # The job's result if it finishes within a moment (cache hits, small
+    # data). Otherwise a poller reruns the page once the job is done, and
+    # either the rest of the script is skipped (stop) or None is returned so
+    # the page can render without this result. A failed job raises JobFailed.
+    job, result = start_job(stage, key, fn, timeout=JOB_WAIT_SECONDS)
+    if job is not None:
+        _render_job_status(job, label)
+        if stop:
+            st.stop()
+    return result
+
+
+def render_what_if_inputs(feature_columns):
+    # Sidebar controls for batch what-if scenarios around the tuned point
+    with st.sidebar.expander("🧪 What-if Scenarios", expanded=False):
+        mode = st.radio(
+            "Scenarios",
+            ["Off", "Sweep a feature", "Upload scenarios"],
+            key="what_if_mode",
+        )
+        if mode == "Sweep a feature":
+            return {
+                "mode": "sweep",
+                "feature": st.selectbox("Feature to sweep", feature_columns),
+                "steps": st.slider("Steps", 2, 1000, WHAT_IF_SWEEP_STEPS),
+            }
+        if mode == "Upload scenarios":
+            uploaded = st.file_uploader(
+                "Scenarios CSV",
+                type=["csv"],
+                help="One row per scenario with any of the feature columns; "
+                "missing features take the interactive point's values",
+            )
+            return {"mode": "upload", "file": uploaded} if uploaded else None
+    return None
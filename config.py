@@ -40,3 +40,87 @@ MODERN_COLORS = [
     "#AED6F1",  # Powder Blue
     "#D5A6BD",  # Dusty Rose
 ]
+
+# Upper bound on the memory held by cached scaler+PCA fits and their projections
+FIT_CACHE_MAX_BYTES = 512 * 1024**2
+
+# Upper bound on the memory held by parsed and imputed uploads
+DATASET_CACHE_MAX_BYTES = 2 * 1024**3
+
+# dtype used when parsing feature columns
+FEATURE_DTYPE = "float64"
+PRECISIONS = ["float64", "float32"]
+
+# float32 fits are checked against float64 on a row sample: explained variance
+# ratios and sign-aligned loadings must agree within this absolute tolerance
+FLOAT32_TOLERANCE = 1e-3
+FLOAT32_VALIDATION_ROWS = 20_000
+
+# How missing feature values are handled: filled with the column mean or median,
+# or rows containing any are dropped
+IMPUTE_STRATEGIES = ["mean", "median", "drop"]
+IMPUTE_STRATEGY = "mean"
+
+# Medians are estimated from at most this many rows per column
+MEDIAN_SAMPLE_ROWS = 100_000
+
+# Rows per chunk in streaming mode; bounds peak memory independently of file size
+STREAM_CHUNK_ROWS = 100_000
+
+# Components fitted once per dataset; any three of them can be plotted without
+# refitting
+PCA_COMPONENTS = 10
+MAX_PCA_COMPONENTS = 50
+
+# PCA solver strategy: "auto" picks one from the shape of the data
+PCA_SOLVER = "auto"
+PCA_SOLVERS = ["auto", "full", "randomized", "covariance_eigh"]
+RANDOMIZED_OVERSAMPLES = 10
+RANDOMIZED_POWER_ITERATIONS = 4
+
+# Level of detail: maximum points per class sent to the 3D plot
+LOD_MAX_POINTS_PER_CLASS = 5000
+
+# Widest feature loadings heatmap; wider data shows the top features only
+HEATMAP_MAX_FEATURES = 50
+
+# Above this many features the sidebar switches to paged sliders / bulk entry
+SIDEBAR_MAX_SLIDERS = 30
+SLIDER_PAGE_SIZE = 12
+
+# Directory of saved projections, keyed by the digest of the uploaded file
+ARTIFACT_DIR = "artifacts"
+
+# Nearest neighbours of the interactive point, looked up in PCA space
+KNN_DEFAULT_K = 15
+KNN_MAX_K = 200
+KNN_LEAF_SIZE = 40
+
+# Class decision regions: a classifier fitted on PCA coordinates, evaluated on
+# a grid over their bounding box in batches spread over all cores
+REGION_GRID_SIZE = 20
+REGION_GRID_SIZE_2D = 100
+REGION_MAX_CLASSES = 10
+REGION_FIT_ROWS = 200_000
+REGION_BATCH_ROWS = 4096
+REGION_N_JOBS = -1
+
+# Progressive preview: uploads with more rows than this are first fitted on a
+# uniform row sample while the full fit runs in a background thread
+PROGRESSIVE_MIN_ROWS = 1_000_000
+PROGRESSIVE_SAMPLE_ROWS = 200_000
+PROGRESSIVE_POLL_SECONDS = 2
+
+# Background jobs for parsing, fitting and index builds. Pages wait briefly for
+# a job inline and otherwise poll it, so cached work never waits for a poll.
+# Finished jobs are dropped once their sessions have taken the result; at most
+# JOB_HISTORY jobs are tracked in case a session never comes back for one.
+JOB_WORKERS = 4
+JOB_HISTORY = 32
+JOB_WAIT_SECONDS = 0.5
+JOB_POLL_SECONDS = 1
+
+# What-if scenarios: points per feature sweep, and the most scenario points
+# drawn in the 3D plot (all of them are projected and exported)
+WHAT_IF_SWEEP_STEPS = 50
+WHAT_IF_MAX_POINTS = 20_000
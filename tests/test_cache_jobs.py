@@ -0,0 +1,133 @@
+import contextvars
+import gc
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from sklearn.decomposition import PCA
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from utils.cache import ByteBudgetCache, start_leasing
+from utils.jobs import JobManager
+from utils.pca_utils import affine_projection, project_affine
+
+
+def in_new_context(fn):
+    # Each test gets its own lease context, like a Streamlit rerun
+    return contextvars.Context().run(fn)
+
+
+def block(n_bytes):
+    return np.zeros(n_bytes, dtype=np.uint8)
+
+
+def test_eviction_never_drops_leased_entries():
+    cache = ByteBudgetCache(100)
+
+    def lease_one():
+        leases = start_leasing()
+        cache.put("leased", block(80))
+        return leases
+
+    # Held like a session's cache_leases until its next rerun
+    leases = in_new_context(lease_one)
+    in_new_context(lambda: cache.put("unleased", block(80)))
+    in_new_context(lambda: cache.put("newest", block(80)))
+
+    assert cache.get("leased") is not None
+    assert cache.get("unleased") is None
+    assert cache.get("newest") is not None
+    del leases
+
+
+def test_leases_are_released_when_their_dict_is_dropped():
+    cache = ByteBudgetCache(100)
+
+    def run():
+        leases = start_leasing()
+        cache.put("a", block(80))
+        # Two reruns later the first rerun's leases are no longer carried
+        leases = start_leasing(start_leasing(leases))
+        del leases
+        gc.collect()
+
+    in_new_context(run)
+    assert cache.stats()["leased"] == 0
+    in_new_context(lambda: cache.put("b", block(80)))
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+
+
+def test_concurrent_get_or_build_runs_one_build():
+    cache = ByteBudgetCache(1024)
+    builds = []
+    start = threading.Barrier(8)
+
+    def build():
+        builds.append(1)
+        time.sleep(0.1)
+        return block(8)
+
+    def ask():
+        start.wait()
+        return in_new_context(lambda: cache.get_or_build("key", build))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: ask(), range(8)))
+
+    assert len(builds) == 1
+    assert all(value is results[0][0] for value, _ in results)
+    assert sum(not hit for _, hit in results) == 1
+
+
+def test_superseded_queued_job_is_cancelled():
+    manager = JobManager(max_workers=1, history=8)
+    release = threading.Event()
+    try:
+        manager.submit("busy", release.wait, owner=("other", "fit"))
+        queued = manager.submit("first", lambda: "first", owner=("session", "fit"))
+        latest = manager.submit("second", lambda: "second", owner=("session", "fit"))
+
+        assert queued.status() == "cancelled"
+        assert manager.get(queued.id) is None
+        assert manager.get(latest.id) is latest
+    finally:
+        release.set()
+    assert latest.future.result(timeout=5) == "second"
+
+
+def test_failed_job_is_not_resubmitted():
+    manager = JobManager(max_workers=1, history=8)
+    calls = []
+
+    def fail():
+        calls.append(1)
+        raise ValueError("Input X contains infinity")
+
+    job = manager.submit("fit", fail, owner=("session", "fit"))
+    assert isinstance(job.future.exception(timeout=5), ValueError)
+
+    again = manager.submit("fit", fail, owner=("session", "fit"))
+    assert again is job
+    assert again.status() == "failed"
+    assert len(calls) == 1
+
+
+def test_project_affine_matches_pipeline_transform():
+    rng = np.random.default_rng(0)
+    X = rng.normal(loc=3.0, scale=[1.0, 5.0, 0.1, 2.0, 7.0], size=(1000, 5))
+    pipeline = Pipeline(
+        [("scaler", StandardScaler()), ("pca", PCA(n_components=3, random_state=0))]
+    ).fit(X)
+    affine = affine_projection(pipeline)
+
+    np.testing.assert_allclose(
+        project_affine(X, affine, block_rows=128), pipeline.transform(X), atol=1e-10
+    )
+    np.testing.assert_allclose(
+        project_affine(X.astype(np.float32), affine),
+        pipeline.transform(X),
+        atol=1e-4,
+    )
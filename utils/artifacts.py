@@ -0,0 +1,160 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+from cachetools import LRUCache
+from sklearn.decomposition import PCA
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+# Memory-mapped artifacts cost address space, not RAM, so they are bounded by
+# count. Reusing the same mapping also keeps X_pca identical across reruns.
+_loaded_artifacts = LRUCache(maxsize=16)
+
+_ARRAYS = [
+    "X_pca",
+    "class_codes",
+    "scaler_mean",
+    "scaler_scale",
+    "scaler_var",
+    "components",
+    "pca_mean",
+    "explained_variance",
+    "explained_variance_ratio",
+]
+
+
+def fit_settings(
+    solver, n_components, precision, n_oversamples, power_iterations, streaming=False
+):
+    # What a projection was fitted with. An artifact is only reopened for the
+    # same settings, so changing them in the sidebar refits instead.
+    settings = {
+        "solver": "incremental" if streaming else solver,
+        "n_components": int(n_components),
+        "precision": np.dtype(precision).name,
+    }
+    if settings["solver"] == "randomized":
+        settings["n_oversamples"] = int(n_oversamples)
+        settings["power_iterations"] = int(power_iterations)
+    return settings
+
+
+def save_artifact(
+    artifact_dir,
+    digest,
+    X_pca,
+    pipeline,
+    fit_info,
+    class_codes,
+    unique_classes,
+    feature_columns,
+    settings,
+):
+    scaler = pipeline.named_steps["scaler"]
+    pca = pipeline.named_steps["pca"]
+    arrays = {
+        "X_pca": X_pca,
+        "class_codes": class_codes,
+        "scaler_mean": scaler.mean_,
+        "scaler_scale": scaler.scale_,
+        "scaler_var": scaler.var_,
+        "components": pca.components_,
+        "pca_mean": pca.mean_,
+        "explained_variance": pca.explained_variance_,
+        "explained_variance_ratio": pca.explained_variance_ratio_,
+    }
+    meta = {
+        "feature_columns": [str(column) for column in feature_columns],
+        "classes": [str(label) for label in unique_classes],
+        "n_samples_seen": int(np.max(scaler.n_samples_seen_)),
+        "solver": fit_info["solver"],
+        "fit_seconds": fit_info["fit_seconds"],
+        "feature_stats": fit_info["feature_stats"].to_numpy().tolist(),
+        "fit_settings": settings,
+    }
+
+    # Write into a scratch directory and rename it into place so readers never
+    # see a partially written artifact
+    os.makedirs(artifact_dir, exist_ok=True)
+    target = os.path.join(artifact_dir, digest)
+    scratch = tempfile.mkdtemp(dir=artifact_dir, prefix=f".{digest}-")
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(scratch, f"{name}.npy"), np.ascontiguousarray(array))
+        with open(os.path.join(scratch, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        os.replace(scratch, target)
+    except BaseException:
+        shutil.rmtree(scratch, ignore_errors=True)
+        raise
+    _loaded_artifacts.pop((artifact_dir, digest), None)
+    return target
+
+
+def load_artifact(artifact_dir, digest, settings):
+    key = (artifact_dir, digest)
+    if key in _loaded_artifacts:
+        artifact, saved_settings = _loaded_artifacts[key]
+        return artifact if saved_settings == settings else None
+
+    path = os.path.join(artifact_dir, digest)
+    if not os.path.isfile(os.path.join(path, "meta.json")):
+        return None
+
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    # Artifacts saved before settings were recorded count as a mismatch
+    saved_settings = meta.get("fit_settings")
+    if saved_settings != settings:
+        return None
+    arrays = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+        for name in _ARRAYS
+    }
+
+    # Rebuild fitted estimators from their learned attributes; transform only
+    # needs these, and the arrays stay zero-copy views of the files
+    n_features = len(meta["feature_columns"])
+    scaler = StandardScaler()
+    scaler.mean_ = np.asarray(arrays["scaler_mean"])
+    scaler.scale_ = np.asarray(arrays["scaler_scale"])
+    scaler.var_ = np.asarray(arrays["scaler_var"])
+    scaler.n_features_in_ = n_features
+    scaler.n_samples_seen_ = meta["n_samples_seen"]
+
+    components = np.asarray(arrays["components"])
+    pca = PCA(n_components=len(components))
+    pca.components_ = components
+    pca.mean_ = np.asarray(arrays["pca_mean"])
+    pca.explained_variance_ = np.asarray(arrays["explained_variance"])
+    pca.explained_variance_ratio_ = np.asarray(arrays["explained_variance_ratio"])
+    pca.n_components_ = len(components)
+    pca.n_features_in_ = n_features
+    pca.n_samples_ = meta["n_samples_seen"]
+
+    fit_info = {
+        "solver": meta["solver"],
+        "fit_seconds": meta["fit_seconds"],
+        "cached": True,
+        "feature_stats": pd.DataFrame(
+            meta["feature_stats"],
+            index=["min", "max", "mean", "std"],
+            columns=meta["feature_columns"],
+        ),
+    }
+    artifact = (
+        arrays["X_pca"],
+        Pipeline([("scaler", scaler), ("pca", pca)]),
+        fit_info,
+        arrays["class_codes"],
+        np.array(meta["classes"]),
+        meta["feature_columns"],
+    )
+    _loaded_artifacts[key] = (artifact, saved_settings)
+    return artifact
@@ -0,0 +1,227 @@
+import contextvars
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from config import FIT_CACHE_MAX_BYTES
+from utils.perf import record_cache
+
+
+def digest_array(X):
+    # blake2b over the raw buffer is several GB/s and avoids pickling the array
+    X = np.ascontiguousarray(X)
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(str((X.shape, X.dtype.str)).encode())
+    hasher.update(memoryview(X).cast("B"))
+    return hasher.hexdigest()
+
+
+def digest_file(path, block_size=16 * 1024**2):
+    # Same digest as utils.loader.upload_digest gives for the uploaded bytes
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while block := f.read(block_size):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def nbytes_of(value):
+    # Measured once when an entry is stored. Object columns and arrays, such
+    # as string class labels, are counted with the Python objects they point
+    # to rather than at 8 bytes per row.
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            return int(pd.Series(value, copy=False).memory_usage(deep=True))
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(nbytes_of(v) for v in value)
+    if isinstance(value, dict):
+        return sum(nbytes_of(v) for v in value.values())
+    if hasattr(value, "memory_usage"):
+        return int(np.sum(value.memory_usage(index=True, deep=True)))
+    return getattr(value, "nbytes", 0) or 1
+
+
+class CacheLease:
+    # Held by a session for every shared entry it is using; the entry cannot be
+    # evicted while any lease on it is alive. Dropping the lease releases it.
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.key = key
+        weakref.finalize(self, cache._release, key)
+
+
+_current_leases = contextvars.ContextVar("cache_leases", default=None)
+
+
+def start_leasing(previous=None):
+    # Entries read or stored during this rerun are leased into the returned
+    # dict; keeping it in session_state pins them until the next rerun. The
+    # previous rerun's leases ride along until then too: releasing them first
+    # would let eviction drop the session's own entries just before this rerun
+    # leases them again. Only one rerun back is kept.
+    leases = {}
+    if previous is not None:
+        previous.pop("previous", None)
+        leases["previous"] = previous
+    _current_leases.set(leases)
+    return leases
+
+
+class ByteBudgetCache:
+    # LRU cache bounded by the total size of its values rather than their count,
+    # shared read-only by every Streamlit session running in this process, so
+    # memory grows with distinct datasets rather than with sessions. Entries
+    # leased by a live session are never evicted; if only leased entries are
+    # left the cache may run over budget until they are released.
+    def __init__(self, max_bytes, name="cache"):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        # key -> [value, nbytes, lease count], least recently used first
+        self._entries = OrderedDict()
+        self._building = {}
+        # Reentrant: a lease released by garbage collection while this thread
+        # holds the lock calls back into _release
+        self._lock = threading.RLock()
+
+    def _lease(self, key):
+        # Called with the lock held
+        leases = _current_leases.get()
+        if leases is None or (self.name, key) in leases:
+            return
+        self._entries[key][2] += 1
+        leases[(self.name, key)] = CacheLease(self, key)
+
+    def _release(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[2] -= 1
+                self._evict()
+
+    def _evict(self, keep=None):
+        # Called with the lock held: drop unleased entries, oldest first. The
+        # entry just stored is kept so callers waiting on its build can read it.
+        if self.total_bytes <= self.max_bytes:
+            return
+        for key in [
+            key for key, entry in self._entries.items() if not entry[2] and key != keep
+        ]:
+            self.total_bytes -= self._entries.pop(key)[1]
+            if self.total_bytes <= self.max_bytes:
+                return
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._lease(key)
+        record_cache(self.name, entry is not None)
+        return entry[0] if entry is not None else None
+
+    def lease(self, key):
+        # Pins an entry fetched some other way, e.g. through a background job,
+        # for this rerun. False if it is not cached, such as a value larger
+        # than the whole budget.
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._entries.move_to_end(key)
+            self._lease(key)
+        return True
+
+    def put(self, key, value):
+        if value is None:
+            return value
+        nbytes = nbytes_of(value)
+        if nbytes > self.max_bytes:
+            # Larger than the whole budget: hand it back without caching
+            return value
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous[1]
+            self._entries[key] = [value, nbytes, previous[2] if previous else 0]
+            self.total_bytes += nbytes
+            self._lease(key)
+            self._evict(keep=key)
+        return value
+
+    def get_or_build(self, key, build):
+        # Concurrent sessions asking for the same missing entry wait for a
+        # single build instead of each parsing or fitting the same data.
+        # Returns (value, hit).
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self._lease(key)
+                else:
+                    building = self._building.get(key)
+                    if building is None:
+                        building = self._building[key] = threading.Event()
+                        break
+            if entry is not None:
+                record_cache(self.name, True)
+                return entry[0], True
+            # Another session is building it; if that build fails or is not
+            # cacheable, the loop builds it here instead
+            building.wait()
+
+        record_cache(self.name, False)
+        try:
+            return self.put(key, build()), False
+        finally:
+            with self._lock:
+                del self._building[key]
+            building.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "leased": sum(1 for entry in self._entries.values() if entry[2]),
+                "mb": self.total_bytes / 1024**2,
+                "budget_mb": self.max_bytes / 1024**2,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+
+fit_cache = ByteBudgetCache(FIT_CACHE_MAX_BYTES, name="fit_cache")
+
+
+class ArrayDerivedCache:
+    # Values derived from an array, such as a search index over a projection.
+    # Entries are keyed by the array's identity and dropped by a finalizer when
+    # the array is garbage collected, i.e. once its fit has left the caches.
+    # Values must not hold a reference to the array itself.
+    def __init__(self, name="derived_cache"):
+        self.name = name
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get_or_build(self, array, key, build):
+        entry_key = (id(array), key)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+        hit = entry is not None and entry[0]() is array
+        record_cache(self.name, hit)
+        if hit:
+            return entry[1]
+
+        value = build()
+        with self._lock:
+            self._entries[entry_key] = (weakref.ref(array), value)
+        weakref.finalize(array, self._entries.pop, entry_key, None)
+        return value
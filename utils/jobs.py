@@ -0,0 +1,114 @@
+import contextvars
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cachetools import LRUCache
+
+from config import JOB_HISTORY, JOB_WORKERS
+
+
+class JobFailed(RuntimeError):
+    # A background job raised; carries its message, not its traceback, so
+    # remembering the failure does not keep the job's frames alive
+    pass
+
+
+def job_id_for(key):
+    return hashlib.blake2b(repr(key).encode(), digest_size=8).hexdigest()
+
+
+class Job:
+    def __init__(self, job_id, key, future):
+        self.id = job_id
+        self.key = key
+        self.future = future
+        self.started = time.monotonic()
+        self.owners = set()
+
+    def status(self):
+        if self.future.cancelled():
+            return "cancelled"
+        if self.future.running():
+            return "running"
+        if not self.future.done():
+            return "queued"
+        return "failed" if self.future.exception() is not None else "done"
+
+
+class JobManager:
+    # Runs heavy stages off the Streamlit script thread. Jobs are identified by
+    # a digest of their inputs, so a rerun with unchanged inputs (a slider
+    # nudge, another session on the same data) gets the existing job instead of
+    # queueing the same work again. Each owner, a session and stage pair,
+    # tracks one job at a time; a job no owner wants any more is superseded:
+    # cancelled if it is still queued and forgotten either way. Threads cannot
+    # be interrupted, so a superseded job that is already running finishes and
+    # its result stays in the shared caches for whoever asks next.
+    #
+    # Results are DataFrames, fits and indexes outside the caches' byte
+    # budgets, so the manager does not keep them: once every owner has taken
+    # a finished job's result and released it, the job is dropped. The LRU
+    # bound only matters for jobs whose owners never come back for them.
+    def __init__(self, max_workers=JOB_WORKERS, history=JOB_HISTORY):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="pca-job"
+        )
+        self._jobs = LRUCache(maxsize=history)
+        self._owned = LRUCache(maxsize=1024)
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, owner=None):
+        job_id = job_id_for(key)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status() == "cancelled":
+                # A failed job is handed back as it is rather than run again,
+                # so its owners see the error instead of a job that keeps
+                # failing; new inputs make a new job
+                # Worker threads start with an empty context; run the job in a
+                # copy of the submitter's so its timings and cache hits are
+                # recorded for that rerun
+                context = contextvars.copy_context()
+                job = Job(job_id, key, self._executor.submit(context.run, fn))
+                self._jobs[job_id] = job
+
+            if owner is not None:
+                previous_id = self._owned.get(owner)
+                if previous_id is not None and previous_id != job_id:
+                    self._disown(previous_id, owner)
+                self._owned[owner] = job_id
+                job.owners.add(owner)
+        return job
+
+    def _disown(self, job_id, owner):
+        # Called with the lock held
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        job.owners.discard(owner)
+        if not job.owners:
+            job.future.cancel()
+            del self._jobs[job_id]
+
+    def release(self, job, owner):
+        # The owner has taken the finished job's result
+        with self._lock:
+            if self._owned.get(owner) == job.id:
+                del self._owned[owner]
+            self._disown(job.id, owner)
+
+    def abandon(self, owner):
+        # The owner no longer wants whatever job it is waiting on
+        with self._lock:
+            job_id = self._owned.pop(owner, None)
+            if job_id is not None:
+                self._disown(job_id, owner)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+
+jobs = JobManager()
@@ -1,27 +1,329 @@
+import hashlib
+import threading
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as pa_feather
+import pyarrow.ipc as pa_ipc
+import pyarrow.parquet as pq
 import streamlit as st
+from cachetools import LRUCache
+
+from config import (
+    DATASET_CACHE_MAX_BYTES,
+    FEATURE_DTYPE,
+    IMPUTE_STRATEGY,
+    MEDIAN_SAMPLE_ROWS,
+)
+from utils.cache import ArrayDerivedCache, ByteBudgetCache
+from utils.perf import timed
+
+dataset_cache = ByteBudgetCache(DATASET_CACHE_MAX_BYTES, name="dataset_cache")
+
+# Streamlit keeps the same file_id for an upload across reruns, so the digest
+# of a multi-GB file is only computed once. Job threads use it too, and an
+# LRUCache reorders itself even on reads, so every access takes the lock.
+_upload_digests = LRUCache(maxsize=256)
+_upload_digests_lock = threading.Lock()
+
+
+def upload_digest(uploaded_file):
+    file_id = getattr(uploaded_file, "file_id", None)
+    if file_id is not None:
+        with _upload_digests_lock:
+            digest = _upload_digests.get(file_id)
+        if digest is not None:
+            return digest
+
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(uploaded_file.getbuffer())
+    digest = hasher.hexdigest()
 
+    if file_id is not None:
+        with _upload_digests_lock:
+            _upload_digests[file_id] = digest
+    return digest
 
-def load_and_preprocess_data(uploaded_file):
+
+def file_format(uploaded_file):
+    extension = uploaded_file.name.rsplit(".", 1)[-1].lower()
+    if extension in ("parquet", "pq"):
+        return "parquet"
+    if extension in ("feather", "arrow", "ipc"):
+        return "feather"
+    return "csv"
+
+
+def read_columns(uploaded_file):
+    # Column names from the header or schema only, without reading any rows
+    uploaded_file.seek(0)
+    fmt = file_format(uploaded_file)
+    if fmt == "parquet":
+        columns = pq.read_schema(uploaded_file).names
+    elif fmt == "feather":
+        columns = pa_ipc.open_file(uploaded_file).schema.names
+    else:
+        columns = pd.read_csv(uploaded_file, nrows=0).columns.tolist()
+    uploaded_file.seek(0)
+    return columns
+
+
+def _read_csv(uploaded_file, columns, dtype):
+    feature_columns = columns[:-1]
+
+    # Parse features straight into floats with the multithreaded pyarrow
+    # engine; fall back to the default parser for files it rejects.
+    uploaded_file.seek(0)
     try:
-        df = pd.read_csv(uploaded_file)
-    except Exception as e:
-        st.error(f"Error reading CSV file: {e}")
-        return None
+        df = pd.read_csv(
+            uploaded_file,
+            engine="pyarrow",
+            usecols=columns,
+            dtype={column: dtype for column in feature_columns},
+        )
+    except Exception:
+        uploaded_file.seek(0)
+        df = pd.read_csv(uploaded_file, usecols=columns)
+    # usecols keeps file order; only reorder when the selection differs
+    if df.columns.tolist() != columns:
+        df = df[columns]
+    return df
+
+
+def _read_columnar(uploaded_file, columns, dtype):
+    uploaded_file.seek(0)
+    if file_format(uploaded_file) == "parquet":
+        table = pq.read_table(uploaded_file, columns=columns)
+    else:
+        table = pa_feather.read_table(uploaded_file, columns=columns)
+
+    # Arrow columns are cast and copied straight into one Fortran-ordered float
+    # array, which pandas keeps as a single block without an object detour;
+    # nulls become NaN.
+    feature_columns = columns[:-1]
+    X = np.empty((table.num_rows, len(feature_columns)), dtype=dtype, order="F")
+    for j, column in enumerate(feature_columns):
+        X[:, j] = (
+            table.column(column)
+            .cast(pa.from_numpy_dtype(X.dtype))
+            .to_numpy(zero_copy_only=False)
+        )
+
+    df = pd.DataFrame(X, columns=feature_columns, copy=False)
+    df[columns[-1]] = table.column(columns[-1]).to_pandas()
+    return df
+
+
+def _approximate_median(values, sample):
+    sampled = values[sample] if sample is not None else values
+    sampled = sampled[~np.isnan(sampled)]
+    return np.median(sampled) if len(sampled) else np.nan
+
+
+def impute_missing(df, feature_columns, strategy=IMPUTE_STRATEGY):
+    # One column at a time: a single NaN scan per column gives its null count,
+    # and the fill value comes from the same mask. Values are filled in place in
+    # the frame's own buffers, so no second copy of the data is made.
+    n_rows = len(df)
+    null_counts = pd.Series(0, index=feature_columns, dtype=np.int64)
+    drop_rows = np.zeros(n_rows, dtype=bool) if strategy == "drop" else None
+
+    sample = None
+    if strategy == "median" and n_rows > MEDIAN_SAMPLE_ROWS:
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(n_rows, MEDIAN_SAMPLE_ROWS, replace=False))
+
+    for column in feature_columns:
+        values = df[column].to_numpy()
+        if values.dtype.kind != "f":
+            # Integers cannot hold NaN; object columns are rejected later
+            continue
+        missing = np.isnan(values)
+        n_missing = int(np.count_nonzero(missing))
+        if not n_missing:
+            continue
+        null_counts[column] = n_missing
+
+        if strategy == "drop":
+            drop_rows |= missing
+            continue
+        if strategy == "median":
+            fill = _approximate_median(values, sample)
+        else:
+            n_present = n_rows - n_missing
+            fill = np.sum(values, where=~missing) / n_present if n_present else np.nan
+        # All-missing columns become constant 0 rather than staying NaN
+        if np.isnan(fill):
+            fill = 0.0
+
+        if not values.flags.writeable:
+            # Copy-on-write frames hand out read-only views
+            values = values.copy()
+            values[missing] = fill
+            df[column] = values
+        else:
+            values[missing] = fill
+
+    if drop_rows is not None and drop_rows.any():
+        df = df.loc[~drop_rows].reset_index(drop=True)
+    return df, null_counts
+
+
+def _missing_message(null_counts, strategy, n_dropped):
+    missing = null_counts[null_counts > 0].sort_values(ascending=False)
+    shown = ", ".join(f"{column} ({n:,})" for column, n in missing.head(10).items())
+    if len(missing) > 10:
+        shown += f" and {len(missing) - 10} more"
+    if strategy == "drop":
+        action = f"{n_dropped:,} rows containing them were dropped"
+    else:
+        action = f"they were filled with column {strategy}s"
+    return (
+        f"⚠️ Dataset contains {int(missing.sum()):,} missing values in "
+        f"{len(missing)} columns: {shown}; {action}."
+    )
+
+
+def _parse_and_impute(uploaded_file, columns, dtype, strategy):
+    messages = []
+    fmt = file_format(uploaded_file)
+    with timed(f"parse_{fmt}"):
+        try:
+            if fmt == "csv":
+                df = _read_csv(uploaded_file, columns, dtype)
+            else:
+                df = _read_columnar(uploaded_file, columns, dtype)
+        except Exception as e:
+            raise ValueError(f"Error reading {fmt.upper()} file: {e}") from e
 
     if df.shape[1] < 2:
-        st.error("Dataset must have at least 2 columns (1 feature + 1 target)")
-        return None
+        raise ValueError("Dataset must have at least 2 columns (1 feature + 1 target)")
 
     if df.shape[1] < 4:
-        st.warning(
+        messages.append(
             "Dataset has less than 3 features. PCA will use all available dimensions."
         )
 
-    if df.isnull().sum().sum() > 0:
-        st.warning(
-            "⚠️ Dataset contains missing values. They will be filled with column means."
+    with timed("impute"):
+        n_rows = len(df)
+        df, null_counts = impute_missing(df, columns[:-1], strategy)
+        if null_counts.any():
+            messages.append(_missing_message(null_counts, strategy, n_rows - len(df)))
+        if df.empty:
+            raise ValueError("No rows are left after dropping those with missing values")
+
+    return df, messages
+
+
+def _feature_matrix(df, dtype, block_rows=4096):
+    # One C-contiguous float matrix of the features, built once per parse so
+    # reruns neither select the columns (a copy in pandas 2) nor cast them
+    # again, and hashing and row gathers read it without another copy. Row
+    # blocks are interleaved straight from the column arrays, so the data is
+    # copied once; the frame itself is not kept.
+    columns = [df.iloc[:, j].to_numpy() for j in range(df.shape[1] - 1)]
+    X = np.empty((len(df), len(columns)), dtype=dtype)
+    try:
+        with timed("feature_matrix"):
+            for start in range(0, len(df), block_rows):
+                np.stack(
+                    [column[start : start + block_rows] for column in columns],
+                    axis=1,
+                    out=X[start : start + block_rows],
+                    casting="unsafe",
+                )
+    except (TypeError, ValueError) as e:
+        raise ValueError(
+            "All feature columns must contain numerical values only."
+        ) from e
+    # Shared read-only by every session using this dataset
+    X.setflags(write=False)
+    y = df.iloc[:, -1].to_numpy()
+    with timed("encode_classes"):
+        class_codes, unique_classes = encode_classes(y)
+    return {
+        "X": X,
+        "y": y,
+        "class_codes": class_codes,
+        "unique_classes": unique_classes,
+        "feature_columns": df.columns[:-1].tolist(),
+        "target_column": df.columns[-1],
+    }
+
+
+def load_dataset(
+    uploaded_file, columns=None, dtype=FEATURE_DTYPE, impute=IMPUTE_STRATEGY
+):
+    # The parsed and imputed upload as a feature matrix and target, with a
+    # preview and the warnings to show for it, shared through the dataset
+    # cache. Runs in background jobs, so problems are
+    # raised as ValueError rather than reported through Streamlit.
+    # columns: features followed by the target; defaults to every column
+    if columns is None:
+        columns = read_columns(uploaded_file)
+    columns = list(columns)
+
+    cache_key = (
+        upload_digest(uploaded_file),
+        uploaded_file.size,
+        tuple(columns),
+        str(dtype),
+        impute,
+    )
+
+    def parse():
+        df, messages = _parse_and_impute(uploaded_file, columns, dtype, impute)
+        return dict(
+            _feature_matrix(df, dtype),
+            preview=df.head(10).copy(),
+            messages=messages,
+            cache_key=cache_key,
         )
-        df = df.fillna(df.mean(numeric_only=True))
 
+    # Sessions uploading the same file share one parsed copy. A dataset larger
+    # than the cache budget is returned without being cached; the caller must
+    # hold on to it rather than load it again.
+    dataset, _ = dataset_cache.get_or_build(cache_key, parse)
+    return dataset
+
+
+def load_and_preprocess_data(
+    uploaded_file, columns=None, dtype=FEATURE_DTYPE, impute=IMPUTE_STRATEGY
+):
+    try:
+        dataset = load_dataset(uploaded_file, columns, dtype, impute)
+    except ValueError as e:
+        st.error(str(e))
+        return None
+
+    for message in dataset["messages"]:
+        st.warning(message)
+
+    # A frame over the cached arrays, without copying them
+    df = pd.DataFrame(dataset["X"], columns=dataset["feature_columns"], copy=False)
+    df[dataset["target_column"]] = dataset["y"]
     return df
+
+
+def encode_classes(y):
+    # Single factorize pass; labels are ordered by their string form so class
+    # order and colours match sorting the stringified target.
+    codes, uniques = pd.factorize(y, use_na_sentinel=False)
+    labels = np.asarray(uniques).astype(str)
+    order = np.argsort(labels, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return rank[codes], labels[order]
+
+
+# Per-class sample counts, kept as long as the class codes they count are
+_class_counts = ArrayDerivedCache(name="class_counts")
+
+
+def class_counts(class_codes, n_classes):
+    return _class_counts.get_or_build(
+        class_codes,
+        n_classes,
+        lambda: np.bincount(class_codes, minlength=n_classes),
+    )
@@ -0,0 +1,29 @@
+import numpy as np
+from sklearn.neighbors import KDTree
+
+from config import KNN_LEAF_SIZE
+from utils.cache import ArrayDerivedCache
+
+# One KD-tree per projection, shared by every session showing it
+_indexes = ArrayDerivedCache(name="knn_index")
+
+
+def _build_index(X_pca):
+    # X_pca has at most three columns, where a KD-tree answers k-nearest
+    # queries in roughly O(k log n) instead of a scan over every row. The tree
+    # gets its own copy: a view would keep X_pca alive and the entry with it.
+    return KDTree(np.array(X_pca, dtype=np.float64), leaf_size=KNN_LEAF_SIZE)
+
+
+def neighbor_index(X_pca):
+    return _indexes.get_or_build(X_pca, None, lambda: _build_index(X_pca))
+
+
+def query_neighbors(index, point_pca, k):
+    k = min(k, index.data.shape[0])
+    distances, indices = index.query(point_pca, k=k)
+    return distances[0], indices[0]
+
+
+def neighbor_class_counts(class_codes, indices, n_classes):
+    return np.bincount(class_codes[indices], minlength=n_classes)
@@ -1,17 +1,239 @@
+import time
+
+import numpy as np
+import pandas as pd
 from sklearn.decomposition import PCA
 from sklearn.preprocessing import StandardScaler
 from sklearn.pipeline import Pipeline
 import streamlit as st
 
+from config import (
+    FLOAT32_TOLERANCE,
+    FLOAT32_VALIDATION_ROWS,
+    PCA_COMPONENTS,
+    PCA_SOLVER,
+    RANDOMIZED_OVERSAMPLES,
+    RANDOMIZED_POWER_ITERATIONS,
+)
+from utils.cache import ArrayDerivedCache, digest_array, fit_cache
+from utils.perf import timed
+
+
+def column_ranges(X, block_rows=65536):
+    # Min and max together over cache-sized row blocks, so X is read once
+    col_min = np.full(X.shape[1], np.inf)
+    col_max = np.full(X.shape[1], -np.inf)
+    for start in range(0, X.shape[0], block_rows):
+        block = X[start : start + block_rows]
+        np.fmin(col_min, np.nanmin(block, axis=0), out=col_min)
+        np.fmax(col_max, np.nanmax(block, axis=0), out=col_max)
+    return col_min, col_max
+
+
+def feature_stats_frame(scaler, col_min, col_max, feature_columns):
+    # Mean and std come from the fitted scaler; std uses ddof=1 like describe()
+    n_seen = np.maximum(scaler.n_samples_seen_, 2)
+    return pd.DataFrame(
+        [col_min, col_max, scaler.mean_, np.sqrt(scaler.var_ * n_seen / (n_seen - 1))],
+        index=["min", "max", "mean", "std"],
+        columns=feature_columns,
+    )
 
-def apply_pca_and_scaling(X, feature_columns):
-    n_components = min(3, len(feature_columns))
 
+def select_svd_solver(n_samples, n_features, n_components):
+    # Tall, moderately wide data: eigendecomposition of the small
+    # n_features x n_features covariance matrix beats any SVD of X.
+    if n_features <= 1000 and n_samples >= 10 * n_features:
+        return "covariance_eigh"
+    # Only a handful of components out of a large matrix: randomized SVD
+    # avoids computing the full decomposition.
+    if min(n_samples, n_features) > 500 and n_components < 0.1 * min(
+        n_samples, n_features
+    ):
+        return "randomized"
+    return "full"
+
+
+def _build_pipeline(n_components, solver, pca_kwargs):
     # Create a pipeline for scaling and PCA
-    pipeline = Pipeline(
-        [("scaler", StandardScaler()), ("pca", PCA(n_components=n_components))]
+    return Pipeline(
+        [
+            ("scaler", StandardScaler()),
+            (
+                "pca",
+                PCA(
+                    n_components=n_components,
+                    svd_solver=solver,
+                    random_state=0,
+                    **pca_kwargs,
+                ),
+            ),
+        ]
+    )
+
+
+def check_float32_fit(
+    X, n_components, solver, pca_kwargs, max_rows=FLOAT32_VALIDATION_ROWS
+):
+    # Refit a row sample in both precisions so that rounding is the only
+    # difference, then compare explained variance and sign-aligned loadings
+    rng = np.random.default_rng(0)
+    rows = np.sort(rng.choice(len(X), size=min(len(X), max_rows), replace=False))
+    sample = X[rows]
+
+    pca32 = _build_pipeline(n_components, solver, pca_kwargs)
+    pca32 = pca32.fit(sample.astype(np.float32)).named_steps["pca"]
+    pca64 = _build_pipeline(n_components, solver, pca_kwargs)
+    pca64 = pca64.fit(sample.astype(np.float64)).named_steps["pca"]
+
+    variance_error = np.max(
+        np.abs(pca32.explained_variance_ratio_ - pca64.explained_variance_ratio_)
+    )
+    signs = np.sign(np.sum(pca32.components_ * pca64.components_, axis=1))
+    loading_error = np.max(
+        np.abs(pca32.components_ * signs[:, None] - pca64.components_)
+    )
+    return {
+        "variance_error": float(variance_error),
+        "loading_error": float(loading_error),
+        "within_tolerance": max(variance_error, loading_error) <= FLOAT32_TOLERANCE,
+    }
+
+
+def _fit(X, feature_columns, n_components, solver, pca_kwargs):
+    pipeline = _build_pipeline(n_components, solver, pca_kwargs)
+
+    start = time.perf_counter()
+    with timed("fit"):
+        pipeline.fit(X)
+    fit_seconds = time.perf_counter() - start
+
+    # The projection reads X once through the fused affine map rather than
+    # materializing the scaled copy again; float32 data stays float32
+    with timed("project"):
+        X_pca = np.empty(
+            (len(X), pipeline.named_steps["pca"].n_components_),
+            dtype=X.dtype if X.dtype == np.float32 else np.float64,
+        )
+        project_affine(X, affine_projection(pipeline), out=X_pca)
+
+    with timed("feature_stats"):
+        feature_stats = feature_stats_frame(
+            pipeline.named_steps["scaler"], *column_ranges(X), feature_columns
+        )
+    fit_info = {
+        "solver": solver,
+        "fit_seconds": fit_seconds,
+        "cached": False,
+        "feature_stats": feature_stats,
+    }
+    if X.dtype == np.float32:
+        fit_info["float32_check"] = check_float32_fit(
+            X, n_components, solver, pca_kwargs
+        )
+
+    # Cached arrays are shared between reruns and sessions
+    X_pca.setflags(write=False)
+    return X_pca, pipeline, fit_info
+
+
+def apply_pca_and_scaling(
+    X,
+    feature_columns,
+    solver=PCA_SOLVER,
+    n_oversamples=RANDOMIZED_OVERSAMPLES,
+    power_iterations=RANDOMIZED_POWER_ITERATIONS,
+    n_components=PCA_COMPONENTS,
+):
+    n_components = min(n_components, len(feature_columns), len(X))
+    if solver == "auto":
+        solver = select_svd_solver(X.shape[0], X.shape[1], n_components)
+
+    # Reruns triggered by the sidebar reuse the fitted pipeline and projection;
+    # only the tunable point needs to be transformed again.
+    with timed("hash_X"):
+        X_digest = digest_array(X)
+    cache_key = (
+        X_digest,
+        tuple(feature_columns),
+        n_components,
+        solver,
+        n_oversamples if solver == "randomized" else None,
+        power_iterations if solver == "randomized" else None,
+    )
+
+    pca_kwargs = {}
+    if solver == "randomized":
+        pca_kwargs = dict(n_oversamples=n_oversamples, iterated_power=power_iterations)
+
+    # Concurrent sessions with the same data wait for one fit
+    (X_pca, pipeline, fit_info), hit = fit_cache.get_or_build(
+        cache_key, lambda: _fit(X, feature_columns, n_components, solver, pca_kwargs)
     )
+    # Fits built in a background job reach the session through a future; the
+    # key lets its script thread lease the cached entry
+    return X_pca, pipeline, dict(fit_info, cached=hit, cache_key=cache_key)
+
+
+# Fused projections of fitted pipelines, kept as long as their PCA is
+_affine_maps = ArrayDerivedCache(name="affine_map")
+
+
+def affine_projection(pipeline):
+    # StandardScaler followed by (non-whitened) PCA is one affine map:
+    #   ((x - mu) / s - m) @ C.T  ==  x @ (C / s).T - (mu / s + m) @ C.T
+    # so projecting needs one GEMM and no scaled intermediate
+    scaler = pipeline.named_steps["scaler"]
+    pca = pipeline.named_steps["pca"]
+
+    def build():
+        mean = scaler.mean_ if scaler.with_mean else 0.0
+        scale = scaler.scale_ if scaler.with_std else 1.0
+        weights = np.ascontiguousarray((pca.components_ / scale).T)
+        offset = -(mean / scale + pca.mean_) @ pca.components_.T
+        return weights, offset
+
+    return _affine_maps.get_or_build(pca.components_, "affine", build)
+
+
+def project_affine(X, affine, out=None, block_rows=65536):
+    # Row blocks keep each block of X and its output in cache between the GEMM
+    # and the offset add; out may be a preallocated (len(X), k) buffer
+    weights, offset = affine
+    if X.dtype == np.float32:
+        weights, offset = weights.astype(np.float32), offset.astype(np.float32)
+    if out is None:
+        out = np.empty((len(X), weights.shape[1]), dtype=weights.dtype)
+    for start in range(0, len(X), block_rows):
+        block = out[start : start + block_rows]
+        np.matmul(X[start : start + block_rows], weights, out=block)
+        block += offset
+    return out
+
+
+def project_points(pipeline, points):
+    # Any number of points through the fused scaler and PCA map at once,
+    # without the per-call validation of two transform() calls
+    return project_affine(
+        np.asarray(points, dtype=np.float64), affine_projection(pipeline)
+    )
+
+
+# Column subsets of cached projections, kept as long as the projection is
+_axis_slices = ArrayDerivedCache(name="axis_slice")
+
+
+def projection_axes(X_pca, axes):
+    # The projection for the chosen plot axes: a column slice of the cached
+    # k-component fit, so switching axes never refits. The slice is cached so
+    # indexes built on it (neighbours, regions) survive reruns.
+    axes = tuple(axes)
+    if axes == tuple(range(X_pca.shape[1])):
+        return X_pca
 
-    X_pca = pipeline.fit_transform(X)
+    def build():
+        X_axes = np.ascontiguousarray(X_pca[:, list(axes)])
+        X_axes.setflags(write=False)
+        return X_axes
 
-    return X_pca, pipeline, X_pca
+    return _axis_slices.get_or_build(X_pca, axes, build)
@@ -0,0 +1,88 @@
+import contextvars
+import json
+import logging
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+logger = logging.getLogger("pca_visualizer.perf")
+
+_current_recorder = contextvars.ContextVar("perf_recorder", default=None)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _rss_bytes():
+    # Resident set size from /proc; a single small read, so cheap enough to
+    # take around every stage. Unavailable outside Linux.
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class PerfRecorder:
+    def __init__(self):
+        self.stages = []
+        self.counters = Counter()
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            rss_after = _rss_bytes()
+            self.stages.append(
+                {
+                    "stage": name,
+                    "ms": seconds * 1000,
+                    "rss_delta_mb": (
+                        (rss_after - rss_before) / 1024**2
+                        if rss_before is not None and rss_after is not None
+                        else None
+                    ),
+                }
+            )
+
+    def to_dict(self):
+        return {
+            "total_ms": (time.perf_counter() - self.started) * 1000,
+            "rss_mb": (_rss_bytes() or 0) / 1024**2,
+            "stages": self.stages,
+            "counters": dict(self.counters),
+        }
+
+    def log(self):
+        logger.info(json.dumps(self.to_dict()))
+
+
+def start_recording():
+    recorder = PerfRecorder()
+    _current_recorder.set(recorder)
+    return recorder
+
+
+@contextmanager
+def timed(name):
+    recorder = _current_recorder.get()
+    if recorder is None:
+        yield
+        return
+    with recorder.stage(name):
+        yield
+
+
+def count(name):
+    recorder = _current_recorder.get()
+    if recorder is not None:
+        recorder.counters[name] += 1
+
+
+def record_cache(name, hit):
+    count(f"{name}_{'hit' if hit else 'miss'}")
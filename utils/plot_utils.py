@@ -2,19 +2,30 @@ import plotly.graph_objects as go
 import plotly.express as px
 import numpy as np
 import streamlit as st
-from config import MODERN_COLORS
+from config import HEATMAP_MAX_FEATURES, MODERN_COLORS, WHAT_IF_MAX_POINTS
 
 
-def create_pca_variance_chart(pca_columns, explained_variance, cumulative_variance):
+def create_pca_variance_chart(
+    pca_columns, explained_variance, cumulative_variance, highlighted=None
+):
+    # highlighted: components currently on the 3D plot axes
     fig_var = go.Figure()
 
+    highlighted = set(highlighted or [])
     fig_var.add_trace(
         go.Bar(
             x=pca_columns,
             y=explained_variance,
             name="Individual",
-            marker_color="lightblue",
-            text=[f"{v:.1%}" for v in explained_variance],
+            marker_color=[
+                "#667eea" if pc in highlighted else "lightblue" for pc in pca_columns
+            ],
+            # Bar labels only while they fit
+            text=(
+                [f"{v:.1%}" for v in explained_variance]
+                if len(pca_columns) <= 15
+                else None
+            ),
             textposition="auto",
         )
     )
@@ -42,24 +53,234 @@ def create_pca_variance_chart(pca_columns, explained_variance, cumulative_varian
     return fig_var
 
 
+def voxel_sample_indices(coords, max_points, seed=0):
+    n_points = len(coords)
+    if max_points is None or n_points <= max_points:
+        return np.arange(n_points)
+
+    # Bin points into a grid with roughly max_points cells over their bounding
+    # box. Every occupied voxel keeps at least one point, so sparse regions and
+    # outliers survive, and dense voxels keep a share proportional to their count.
+    n_dims = coords.shape[1]
+    bins = int(np.ceil(max_points ** (1 / n_dims)))
+    low = coords.min(axis=0)
+    span = coords.max(axis=0) - low
+    span[span == 0] = 1.0
+    cells = np.minimum(((coords - low) / span * bins).astype(np.int64), bins - 1)
+    cell_ids = np.ravel_multi_index(cells.T, (bins,) * n_dims)
+
+    rng = np.random.default_rng(seed)
+    shuffled = rng.permutation(n_points)
+    by_cell = shuffled[np.argsort(cell_ids[shuffled], kind="stable")]
+    sorted_ids = cell_ids[by_cell]
+
+    starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+    counts = np.diff(np.r_[starts, n_points])
+    quota = np.maximum(1, counts * max_points // n_points)
+    rank = np.arange(n_points) - np.repeat(starts, counts)
+    keep = by_cell[rank < np.repeat(quota, counts)]
+
+    if len(keep) > max_points:
+        keep = rng.choice(keep, max_points, replace=False)
+    return np.sort(keep)
+
+
+def partition_by_class(X_pca, class_codes, n_classes):
+    # One stable sort groups rows by class; each class is then a contiguous
+    # slice of the sorted array instead of a boolean mask over every row.
+    order = np.argsort(class_codes, kind="stable")
+    bounds = np.zeros(n_classes + 1, dtype=np.intp)
+    np.cumsum(np.bincount(class_codes, minlength=n_classes), out=bounds[1:])
+    return X_pca[order], bounds
+
+
 def create_pca_3d_plot(
-    pca_df, tunable_point_pca, n_components, unique_classes, colors, explained_variance
+    X_pca,
+    class_codes,
+    tunable_point_pca,
+    n_components,
+    unique_classes,
+    colors,
+    explained_variance,
+    n_features,
+    max_points_per_class=None,
+    neighbor_points=None,
+    regions=None,
+    axis_labels=None,
+    what_if_points=None,
+):
+    fig = create_pca_3d_base_figure(
+        X_pca,
+        class_codes,
+        n_components,
+        unique_classes,
+        colors,
+        explained_variance,
+        n_features,
+        max_points_per_class,
+        regions,
+        axis_labels,
+    )
+    return update_interactive_point(
+        fig, tunable_point_pca, n_components, neighbor_points, what_if_points
+    )
+
+
+def update_interactive_point(
+    fig,
+    tunable_point_pca,
+    n_components,
+    neighbor_points=None,
+    what_if_points=None,
+):
+    # Patch only the traces that follow the sliders; the class traces and
+    # layout of a cached base figure are left untouched.
+    if neighbor_points is None:
+        neighbor_points = np.empty((0, n_components))
+    fig.update_traces(
+        x=neighbor_points[:, 0],
+        y=neighbor_points[:, 1],
+        z=(
+            neighbor_points[:, 2]
+            if n_components > 2
+            else np.zeros(len(neighbor_points))
+        ),
+        selector=dict(uid="knn-neighbors"),
+    )
+
+    # All what-if scenarios share one trace, coloured by scenario order
+    if what_if_points is None:
+        what_if_points = np.empty((0, n_components))
+    order = np.arange(len(what_if_points))
+    if len(what_if_points) > WHAT_IF_MAX_POINTS:
+        order = np.sort(voxel_sample_indices(what_if_points, WHAT_IF_MAX_POINTS))
+    shown = what_if_points[order]
+    fig.update_traces(
+        x=shown[:, 0],
+        y=shown[:, 1],
+        z=shown[:, 2] if n_components > 2 else np.zeros(len(shown)),
+        marker_color=order,
+        name=f"🧪 What-if ({len(what_if_points):,})",
+        visible=len(what_if_points) > 0,
+        selector=dict(uid="what-if"),
+    )
+    fig.update_traces(
+        x=tunable_point_pca[:, 0],
+        y=tunable_point_pca[:, 1],
+        z=tunable_point_pca[:, 2] if n_components > 2 else [0],
+        selector=dict(uid="interactive-point"),
+    )
+
+    if n_components >= 2:
+        theta = np.linspace(0, 2 * np.pi, 20)
+        radius = 0.3
+        fig.update_traces(
+            x=tunable_point_pca[0, 0] + radius * np.cos(theta),
+            y=tunable_point_pca[0, 1] + radius * np.sin(theta),
+            z=[tunable_point_pca[0, 2] if n_components > 2 else 0] * 20,
+            selector=dict(uid="focus-ring"),
+        )
+    return fig
+
+
+def add_region_traces(fig, regions, unique_classes, colors, n_components):
+    if n_components > 2:
+        # One translucent closed surface per class around where it wins. A
+        # single surface is drawn halfway between isomin and isomax, so both
+        # are pinned to the zero margin, i.e. the decision boundary.
+        # Rounded so the repeated grid coordinates serialize compactly
+        grid = np.meshgrid(*regions["axes"], indexing="ij")
+        x, y, z = (axis.ravel().round(4) for axis in grid)
+        for code, margin in regions["margins"].items():
+            fig.add_trace(
+                go.Isosurface(
+                    x=x,
+                    y=y,
+                    z=z,
+                    value=margin.ravel().round(3),
+                    isomin=0,
+                    isomax=0,
+                    surface_count=1,
+                    caps=dict(x_show=False, y_show=False, z_show=False),
+                    colorscale=[[0, colors[code]], [1, colors[code]]],
+                    showscale=False,
+                    opacity=0.15,
+                    name=f"🗺️ {unique_classes[code]} region",
+                    showlegend=True,
+                    hoverinfo="skip",
+                )
+            )
+    else:
+        # Two components: a flat map of the winning class under the points
+        n_classes = len(unique_classes)
+        colorscale = []
+        for code in range(n_classes):
+            colorscale += [
+                [code / n_classes, colors[code]],
+                [(code + 1) / n_classes, colors[code]],
+            ]
+        x_axis, y_axis = regions["axes"]
+        fig.add_trace(
+            go.Surface(
+                x=x_axis,
+                y=y_axis,
+                z=np.zeros((len(y_axis), len(x_axis))),
+                surfacecolor=regions["labels"].T + 0.5,
+                cmin=0,
+                cmax=n_classes,
+                colorscale=colorscale,
+                showscale=False,
+                opacity=0.25,
+                name="🗺️ Class regions",
+                showlegend=True,
+                hoverinfo="skip",
+            )
+        )
+
+
+def create_pca_3d_base_figure(
+    X_pca,
+    class_codes,
+    n_components,
+    unique_classes,
+    colors,
+    explained_variance,
+    n_features,
+    max_points_per_class=None,
+    regions=None,
+    axis_labels=None,
 ):
+    # axis_labels name the components on the x, y and z axes, which need not
+    # be the first three; explained_variance is given in the same order
+    if axis_labels is None:
+        axis_labels = [f"PC{i+1}" for i in range(3)]
+    coordinates_hover = (
+        f"<b>{axis_labels[0]}:</b> %{{x:.3f}}<br>"
+        + f"<b>{axis_labels[1]}:</b> %{{y:.3f}}<br>"
+        + (f"<b>{axis_labels[2]}:</b> %{{z:.3f}}<br>" if n_components > 2 else "")
+    )
+
     fig = go.Figure()
+    sorted_coords, bounds = partition_by_class(X_pca, class_codes, len(unique_classes))
 
     # Add existing data points with beautiful styling
     for i, class_val in enumerate(unique_classes):
-        class_data = pca_df[pca_df["Class"] == class_val]
-        class_count = len(class_data)
+        coords = sorted_coords[bounds[i] : bounds[i + 1]]
+        class_count = len(coords)
+
+        # Level of detail: cap the points sent to the browser per class
+        if max_points_per_class is not None and class_count > max_points_per_class:
+            coords = coords[voxel_sample_indices(coords, max_points_per_class)]
+        shown_label = f" · showing {len(coords):,}" if len(coords) < class_count else ""
 
         # Create gradient effect for each class
         base_color = colors[i]
 
         fig.add_trace(
             go.Scatter3d(
-                x=class_data["PC1"],
-                y=class_data["PC2"],
-                z=class_data["PC3"] if n_components > 2 else [0] * len(class_data),
+                x=coords[:, 0],
+                y=coords[:, 1],
+                z=coords[:, 2] if n_components > 2 else np.zeros(len(coords)),
                 mode="markers",
                 marker=dict(
                     size=6,
@@ -71,12 +292,10 @@ def create_pca_3d_plot(
                     colorscale=[[0, base_color], [1, base_color]],
                     showscale=False,
                 ),
-                name=f"✨ {class_val} ({class_count})",
+                name=f"✨ {class_val} ({class_count:,}{shown_label})",
                 hovertemplate=f'<b style="color:{base_color}">🎯 Class {class_val}</b><br>'
-                + "<b>PC1:</b> %{x:.3f}<br>"
-                + "<b>PC2:</b> %{y:.3f}<br>"
-                + ("<b>PC3:</b> %{z:.3f}<br>" if n_components > 2 else "")
-                + f"<b>📊 Samples:</b> {class_count}<br>"
+                + coordinates_hover
+                + f"<b>📊 Samples:</b> {class_count:,}<br>"
                 + "<extra></extra>",
                 hoverlabel=dict(
                     bgcolor="rgba(255,255,255,0.9)",
@@ -86,12 +305,55 @@ def create_pca_3d_plot(
             )
         )
 
-    # Add interactive tunable point with stunning effects
+    if regions is not None:
+        add_region_traces(fig, regions, unique_classes, colors, n_components)
+
+    # What-if scenario points, filled in by update_interactive_point
     fig.add_trace(
         go.Scatter3d(
-            x=tunable_point_pca[:, 0],
-            y=tunable_point_pca[:, 1],
-            z=tunable_point_pca[:, 2] if n_components > 2 else [0],
+            x=[],
+            y=[],
+            z=[],
+            uid="what-if",
+            mode="markers",
+            marker=dict(size=4, colorscale="Viridis", opacity=0.9, showscale=False),
+            name="🧪 What-if",
+            hovertemplate="<b>🧪 Scenario %{marker.color}</b><br>"
+            + coordinates_hover
+            + "<extra></extra>",
+        )
+    )
+
+    # Rings around the nearest neighbours of the interactive point, filled in
+    # by update_interactive_point
+    fig.add_trace(
+        go.Scatter3d(
+            x=[],
+            y=[],
+            z=[],
+            uid="knn-neighbors",
+            mode="markers",
+            marker=dict(
+                size=11,
+                color="rgba(0,0,0,0)",
+                symbol="circle-open",
+                line=dict(width=3, color="#2C3E50"),
+            ),
+            name="🧭 Nearest Neighbours",
+            hovertemplate="<b>🧭 Neighbour</b><br>"
+            + coordinates_hover
+            + "<extra></extra>",
+        )
+    )
+
+    # Add interactive tunable point with stunning effects; its position is
+    # filled in by update_interactive_point
+    fig.add_trace(
+        go.Scatter3d(
+            x=[],
+            y=[],
+            z=[],
+            uid="interactive-point",
             mode="markers",
             marker=dict(
                 size=16,
@@ -105,9 +367,7 @@ def create_pca_3d_plot(
             ),
             name="🎯 Interactive Point",
             hovertemplate='<b style="color:#FF1744">🎯 Interactive Point</b><br>'
-            + "<b>PC1:</b> %{x:.3f}<br>"
-            + "<b>PC2:</b> %{y:.3f}<br>"
-            + ("<b>PC3:</b> %{z:.3f}<br>" if n_components > 2 else "")
+            + coordinates_hover
             + "🔧 <i>Adjust sliders to move</i><br>"
             + "<extra></extra>",
             hoverlabel=dict(
@@ -120,17 +380,12 @@ def create_pca_3d_plot(
 
     # Add animated orbit traces around the interactive point for visual appeal
     if n_components >= 2:
-        theta = np.linspace(0, 2 * np.pi, 20)
-        radius = 0.3
-        orbit_x = tunable_point_pca[0, 0] + radius * np.cos(theta)
-        orbit_y = tunable_point_pca[0, 1] + radius * np.sin(theta)
-        orbit_z = [tunable_point_pca[0, 2] if n_components > 2 else 0] * 20
-
         fig.add_trace(
             go.Scatter3d(
-                x=orbit_x,
-                y=orbit_y,
-                z=orbit_z,
+                x=[],
+                y=[],
+                z=[],
+                uid="focus-ring",
                 mode="lines",
                 line=dict(color="rgba(255, 23, 68, 0.3)", width=2, dash="dot"),
                 name="🌟 Focus Ring",
@@ -142,16 +397,16 @@ def create_pca_3d_plot(
     # Stunning layout with modern aesthetics and gradients
     fig.update_layout(
         title={
-            "text": f"<b>🌟 Interactive 3D PCA Visualization</b><br><sup>({len(pca_df.columns) - 1} features → {n_components} components)</sup>",
+            "text": f"<b>🌟 Interactive 3D PCA Visualization</b><br><sup>({n_features} features → {n_components} components)</sup>",
             "x": 0.5,
             "xanchor": "center",
             "font": {"size": 22, "color": "#2C3E50", "family": "Arial Black"},
         },
         scene=dict(
-            xaxis_title=f"<b>PC1</b> ({explained_variance[0]:.1%} variance)",
-            yaxis_title=f"<b>PC2</b> ({explained_variance[1]:.1%} variance)",
+            xaxis_title=f"<b>{axis_labels[0]}</b> ({explained_variance[0]:.1%} variance)",
+            yaxis_title=f"<b>{axis_labels[1]}</b> ({explained_variance[1]:.1%} variance)",
             zaxis_title=(
-                f"<b>PC3</b> ({explained_variance[2]:.1%} variance)"
+                f"<b>{axis_labels[2]}</b> ({explained_variance[2]:.1%} variance)"
                 if n_components > 2
                 else "<b>PC3</b> (0% variance)"
             ),
@@ -227,7 +482,19 @@ def create_pca_3d_plot(
     return fig
 
 
-def create_feature_loadings_heatmap(loadings_df):
+def create_feature_loadings_heatmap(loadings_df, max_features=HEATMAP_MAX_FEATURES):
+    subtitle = "Contribution of each feature to principal components"
+
+    # Very wide data: keep the features with the largest total |loading| so
+    # the number of cells sent to the browser stays bounded
+    n_features = len(loadings_df)
+    if max_features is not None and n_features > max_features:
+        importance = np.abs(loadings_df.to_numpy()).sum(axis=1)
+        top = np.argpartition(importance, -max_features)[-max_features:]
+        top = top[np.argsort(importance[top])[::-1]]
+        loadings_df = loadings_df.iloc[top]
+        subtitle = f"Top {max_features} of {n_features} features by total |loading|"
+
     fig_heatmap = go.Figure(
         data=go.Heatmap(
             z=loadings_df.T.values,
@@ -235,6 +502,10 @@ def create_feature_loadings_heatmap(loadings_df):
             y=loadings_df.columns,
             colorscale="RdYlBu_r",
             hoverongaps=False,
+            # Cell labels are drawn by the heatmap itself rather than one
+            # annotation per cell; plotly picks a contrasting font colour
+            texttemplate="%{z:.2f}",
+            textfont=dict(size=10, family="Arial"),
             hovertemplate="<b>%{y}</b><br>"
             + "<b>Feature:</b> %{x}<br>"
             + "<b>Loading:</b> %{z:.3f}<br>"
@@ -251,26 +522,9 @@ def create_feature_loadings_heatmap(loadings_df):
         )
     )
 
-    # Add text annotations for better readability
-    for i, pc in enumerate(loadings_df.columns):
-        for j, feature in enumerate(loadings_df.index):
-            fig_heatmap.add_annotation(
-                x=feature,
-                y=pc,
-                text=f"{loadings_df.loc[feature, pc]:.2f}",
-                showarrow=False,
-                font=dict(
-                    color=(
-                        "white" if abs(loadings_df.loc[feature, pc]) > 0.5 else "black"
-                    ),
-                    size=10,
-                    family="Arial",
-                ),
-            )
-
     fig_heatmap.update_layout(
         title={
-            "text": "<b>🎨 Feature Loadings Heatmap</b><br><sup>Contribution of each feature to principal components</sup>",
+            "text": "<b>🎨 Feature Loadings Heatmap</b><br><sup>" + subtitle + "</sup>",
             "x": 0.5,
             "xanchor": "center",
             "font": {"size": 18, "color": "#2C3E50", "family": "Arial Black"},
@@ -0,0 +1,40 @@
+import numpy as np
+
+from config import PROGRESSIVE_SAMPLE_ROWS
+from utils.pca_utils import apply_pca_and_scaling
+
+
+def sample_rows(n_rows, size, seed=0):
+    # Uniform sample without replacement, sorted so the gather reads X in order
+    rng = np.random.default_rng(seed)
+    return np.sort(rng.choice(n_rows, size=min(size, n_rows), replace=False))
+
+
+def preview_fit(X, feature_columns, sample_size=PROGRESSIVE_SAMPLE_ROWS, **fit_kwargs):
+    rows = sample_rows(len(X), sample_size)
+    sample = X[rows]
+    X_pca, pipeline, fit_info = apply_pca_and_scaling(
+        sample, feature_columns, **fit_kwargs
+    )
+
+    # Convergence estimate: fit each half of the sample on its own. How far
+    # their explained variance ratios disagree bounds the sampling error of
+    # the preview, which has twice their rows.
+    half_ratios = [
+        apply_pca_and_scaling(sample[part], feature_columns, **fit_kwargs)[1]
+        .named_steps["pca"]
+        .explained_variance_ratio_
+        for part in (slice(0, None, 2), slice(1, None, 2))
+    ]
+    fit_info = dict(
+        fit_info,
+        preview={
+            "rows": len(rows),
+            "total_rows": len(X),
+            "variance_spread": float(np.max(np.abs(half_ratios[0] - half_ratios[1]))),
+            # Every solver here is linear in the number of rows
+            "estimated_seconds": fit_info["fit_seconds"] * len(X) / len(rows),
+        },
+    )
+    return rows, (X_pca, pipeline, fit_info)
+
@@ -0,0 +1,99 @@
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.discriminant_analysis import QuadraticDiscriminantAnalysis
+
+from config import (
+    REGION_BATCH_ROWS,
+    REGION_FIT_ROWS,
+    REGION_GRID_SIZE,
+    REGION_MAX_CLASSES,
+    REGION_N_JOBS,
+)
+from utils.cache import ArrayDerivedCache, digest_array
+
+# One region mesh per projection and grid size, shared by every session
+_regions = ArrayDerivedCache(name="region_mesh")
+
+
+def _fit_classifier(X_pca, class_codes, n_classes):
+    # Gaussian class densities give smooth, closed regions and fit in one pass.
+    # Classes with a single sample have no covariance and get no region.
+    counts = np.bincount(class_codes, minlength=n_classes)
+    keep = np.flatnonzero(counts >= 2)
+    if len(keep) < 2:
+        return None
+
+    rows = np.flatnonzero(np.isin(class_codes, keep))
+    if len(rows) > REGION_FIT_ROWS:
+        rng = np.random.default_rng(0)
+        rows = np.sort(rng.choice(rows, REGION_FIT_ROWS, replace=False))
+    model = QuadraticDiscriminantAnalysis(reg_param=1e-3)
+    model.fit(X_pca[rows], class_codes[rows])
+    return model
+
+
+def _build_regions(X_pca, class_codes, n_classes, grid_size):
+    model = _fit_classifier(X_pca, class_codes, n_classes)
+    if model is None:
+        return None
+
+    # Grid over the bounding box of the projection, padded by 5%
+    lo = X_pca.min(axis=0).astype(np.float64)
+    hi = X_pca.max(axis=0).astype(np.float64)
+    pad = (hi - lo) * 0.05
+    axes = [np.linspace(a - p, b + p, grid_size) for a, b, p in zip(lo, hi, pad)]
+    points = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, len(axes))
+
+    # Batches are independent; the numpy work in predict_proba releases the
+    # GIL, so threads share the model without copying it to other processes
+    batches = Parallel(n_jobs=REGION_N_JOBS, prefer="threads")(
+        delayed(model.predict_proba)(points[start : start + REGION_BATCH_ROWS])
+        for start in range(0, len(points), REGION_BATCH_ROWS)
+    )
+    proba = np.concatenate(batches).astype(np.float32)
+
+    shape = (grid_size,) * len(axes)
+    labels = model.classes_[np.argmax(proba, axis=1)].reshape(shape)
+
+    # Margin of each shown class over its strongest rival: the region boundary
+    # is the zero level set, which iso-surfaces interpolate between grid points
+    counts = np.bincount(class_codes, minlength=n_classes)
+    shown = [
+        c for c in np.argsort(counts)[::-1][:REGION_MAX_CLASSES] if c in model.classes_
+    ]
+    margins = {}
+    for code in shown:
+        column = np.searchsorted(model.classes_, code)
+        others = np.delete(proba, column, axis=1)
+        margins[int(code)] = (proba[:, column] - others.max(axis=1)).reshape(shape)
+
+    return {"axes": axes, "labels": labels, "margins": margins}
+
+
+def class_regions(X_pca, class_codes, n_classes, grid_size=REGION_GRID_SIZE):
+    # Byte-identical features share one cached projection, whatever target
+    # they were loaded with, so the labels are part of the key. A digest
+    # rather than their identity: a preview rebuilds its sampled codes on
+    # every rerun.
+    return _regions.get_or_build(
+        X_pca,
+        (digest_array(class_codes), n_classes, grid_size),
+        lambda: _build_regions(X_pca, class_codes, n_classes, grid_size),
+    )
+
+
+def region_codes(regions, points_pca):
+    # Class codes of the grid cells nearest to each point; no model call needed
+    cells = tuple(
+        np.clip(
+            np.rint((points_pca[:, j] - axis[0]) / (axis[1] - axis[0])),
+            0,
+            len(axis) - 1,
+        ).astype(np.intp)
+        for j, axis in enumerate(regions["axes"])
+    )
+    return regions["labels"][cells]
+
+
+def region_at(regions, point_pca):
+    return int(region_codes(regions, point_pca[:1])[0])
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+
+def sweep_points(base_point, feature_index, low, high, steps):
+    # The base point repeated, with one feature stepped across [low, high]
+    points = np.repeat(base_point.reshape(1, -1), steps, axis=0)
+    points[:, feature_index] = np.linspace(low, high, steps)
+    return points
+
+
+def read_scenarios(uploaded_file, feature_columns):
+    # One row per scenario in feature column order; features missing from the
+    # file, or left empty, are NaN until fill_scenarios. Other columns are
+    # ignored.
+    uploaded_file.seek(0)
+    wanted = set(feature_columns)
+    try:
+        frame = pd.read_csv(
+            uploaded_file, engine="pyarrow", usecols=lambda column: column in wanted
+        )
+    except Exception:
+        uploaded_file.seek(0)
+        frame = pd.read_csv(uploaded_file, usecols=lambda column: column in wanted)
+
+    missing_columns = [column for column in feature_columns if column not in frame]
+    points = frame.reindex(columns=feature_columns).to_numpy(dtype=np.float64)
+    points.setflags(write=False)
+    return points, missing_columns
+
+
+def fill_scenarios(points, base_point):
+    # Empty cells take the base point's value. Returns a new array, so parsed
+    # scenarios can be kept and refilled whenever the base point moves.
+    empty = np.isnan(points)
+    if not empty.any():
+        return points
+    return np.where(empty, base_point.reshape(1, -1), points)
@@ -0,0 +1,140 @@
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.decomposition import IncrementalPCA
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from config import FEATURE_DTYPE, PCA_COMPONENTS, STREAM_CHUNK_ROWS
+from utils.cache import fit_cache
+from utils.loader import encode_classes
+from utils.pca_utils import affine_projection, feature_stats_frame, project_affine
+
+
+def _iter_chunks(source, feature_columns, chunksize, columns, dtype):
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return pd.read_csv(
+        source,
+        chunksize=chunksize,
+        usecols=columns,
+        dtype={column: dtype for column in feature_columns},
+    )
+
+
+def _scaled_block(chunk, feature_columns, scaler, dtype):
+    block = chunk[feature_columns].to_numpy(dtype=dtype)
+    # Scale in place; missing values land on the column mean, i.e. 0
+    block = scaler.transform(block, copy=False)
+    block[np.isnan(block)] = 0.0
+    return block
+
+
+def _stream_fit(source, chunksize, columns, dtype, n_components):
+    if columns is None:
+        if hasattr(source, "seek"):
+            source.seek(0)
+        columns = pd.read_csv(source, nrows=0).columns.tolist()
+    if len(columns) < 2:
+        raise ValueError("Dataset must have at least 2 columns (1 feature + 1 target)")
+
+    columns = list(columns)
+    feature_columns = columns[:-1]
+    target_column = columns[-1]
+
+    # Pass 1: scaler statistics, feature ranges and labels
+    scaler = StandardScaler()
+    col_min = np.full(len(feature_columns), np.inf)
+    col_max = np.full(len(feature_columns), -np.inf)
+    labels = []
+    preview = None
+    for chunk in _iter_chunks(source, feature_columns, chunksize, columns, dtype):
+        if preview is None:
+            preview = chunk.head(10)
+        block = chunk[feature_columns].to_numpy(dtype=dtype)
+        scaler.partial_fit(block)
+        np.fmin(col_min, np.nanmin(block, axis=0), out=col_min)
+        np.fmax(col_max, np.nanmax(block, axis=0), out=col_max)
+        labels.append(chunk[target_column].to_numpy())
+    # Labels are encoded here, once per stream, and only the codes are kept
+    class_codes, unique_classes = encode_classes(np.concatenate(labels))
+    del labels
+    n_components = min(n_components, len(feature_columns), len(class_codes))
+
+    # Pass 2: incremental PCA fit on scaled chunks. IncrementalPCA needs at
+    # least n_components rows per batch, so each block is held back for one
+    # chunk: a short block is stacked onto its neighbour, including a short
+    # final chunk, and every row reaches the fit.
+    start_time = time.perf_counter()
+    pca = IncrementalPCA(n_components=n_components)
+    held = None
+    for chunk in _iter_chunks(source, feature_columns, chunksize, columns, dtype):
+        block = _scaled_block(chunk, feature_columns, scaler, dtype)
+        if held is not None and min(len(held), len(block)) < n_components:
+            block = np.vstack([held, block])
+        elif held is not None:
+            pca.partial_fit(held)
+        held = block
+    pca.partial_fit(held)
+
+    pipeline = Pipeline([("scaler", scaler), ("pca", pca)])
+
+    # Pass 3: project the raw chunks with the fused scaler+PCA map straight into
+    # a preallocated output. Missing values take the column mean, as in pass 2.
+    affine = affine_projection(pipeline)
+    X_pca = np.empty((len(class_codes), n_components), dtype=dtype)
+    start = 0
+    for chunk in _iter_chunks(source, feature_columns, chunksize, columns, dtype):
+        block = chunk[feature_columns].to_numpy(dtype=dtype)
+        missing = np.isnan(block)
+        if missing.any():
+            block[missing] = np.take(scaler.mean_, np.nonzero(missing)[1])
+        project_affine(block, affine, out=X_pca[start : start + len(block)])
+        start += len(block)
+    X_pca.setflags(write=False)
+    fit_info = {
+        "solver": "incremental",
+        "fit_seconds": time.perf_counter() - start_time,
+        "cached": False,
+        "feature_stats": feature_stats_frame(scaler, col_min, col_max, feature_columns),
+    }
+
+    return (
+        X_pca,
+        pipeline,
+        fit_info,
+        class_codes,
+        unique_classes,
+        feature_columns,
+        preview,
+    )
+
+
+def stream_pca_from_csv(
+    source,
+    chunksize=STREAM_CHUNK_ROWS,
+    cache_key=None,
+    columns=None,
+    dtype=FEATURE_DTYPE,
+    n_components=PCA_COMPONENTS,
+):
+    # columns: features followed by the target; defaults to every column
+    if cache_key is None:
+        return _stream_fit(source, chunksize, columns, dtype, n_components)
+
+    # Concurrent sessions streaming the same file wait for one pass
+    cache_key = (
+        "stream",
+        cache_key,
+        chunksize,
+        columns and tuple(columns),
+        str(dtype),
+        n_components,
+    )
+    result, hit = fit_cache.get_or_build(
+        cache_key,
+        lambda: _stream_fit(source, chunksize, columns, dtype, n_components),
+    )
+    X_pca, pipeline, fit_info, *rest = result
+    return (X_pca, pipeline, dict(fit_info, cached=hit, cache_key=cache_key), *rest)